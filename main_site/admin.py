@@ -1,13 +1,22 @@
+import io
 import random
 import string
+import tempfile
 
 from django import forms
 from django.contrib import admin
-from django.http import HttpResponseRedirect
-from django.urls import reverse
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import FileResponse, HttpResponseRedirect
+from django.shortcuts import render
+from django.urls import path, reverse
+from django.utils import timezone
 from django_countries import countries
 
-from .forms import BlogForm, BlogAddForm
+from .forms import BlogForm, BlogAddForm, CompanyTrackImportUploadForm
+from .blog_cache import invalidate_blog_on_commit
+from .file_cache import invalidate_cached_file
+from .imports import import_company_tracks, read_rows
 from .models import (
     CompanyTrack,
     License,
@@ -15,7 +24,8 @@ from .models import (
     Website,
     Resume,
     MainSiteContact,
-    Blog
+    Blog,
+    OutboxEmail,
 )
 
 
@@ -74,6 +84,7 @@ class CompanyTrackAdmin(admin.ModelAdmin):
 
     Methods:
         response_add(request, obj, post_url_continue=None): Overrides the response_add method of the ModelAdmin to redirect to a custom page after a new CompanyTrack object is added.
+        import_view(request): Bulk imports CompanyTrack objects from an uploaded CSV or JSON lines file.
     """
 
     # The form to be used in the admin interface for this model.
@@ -99,22 +110,62 @@ class CompanyTrackAdmin(admin.ModelAdmin):
         """
         return HttpResponseRedirect(reverse('copy_page', args=(obj.pk,)))
 
+    def save_model(self, request, obj, form, change):
+        """
+        Overrides the save_model method of the ModelAdmin to drop a replaced resume from the local file cache.
+        """
+        if change and 'resume' in form.changed_data and form.initial.get('resume'):
+            invalidate_cached_file(form.initial['resume'].name)
+        super().save_model(request, obj, form, change)
+
+    def get_urls(self):
+        """
+        Adds the import page in front of the default admin urls.
+        """
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='main_site_companytrack_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """
+        Imports an uploaded CSV or JSON lines file and responds with a CSV of the generated tracker URLs and the
+        skipped rows.
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = CompanyTrackImportUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            result = tempfile.TemporaryFile()
+            output = io.TextIOWrapper(result, encoding='utf-8', newline='')
+            import_company_tracks(read_rows(form.cleaned_data['file']), output,
+                                  resume=form.cleaned_data['resume'] or None)
+            output.flush()
+            output.detach()
+            result.seek(0)
+            return FileResponse(result, as_attachment=True, filename='company_track_import.csv',
+                                content_type='text/csv')
+        return render(request, 'admin/main_site/companytrack/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import applications',
+            'form': form,
+        })
+
     def delete_model(self, request, obj):
         """
         Overrides the delete_model method of the ModelAdmin to delete the resume file associated with the CompanyTrack object.
         """
-        if obj.resume:
-            obj.resume.delete()
+        obj.delete_resume()
         super().delete_model(request, obj)
 
     def delete_queryset(self, request, queryset):
         """
         Overrides the delete_queryset method of the ModelAdmin to delete the resume files associated with the CompanyTrack objects.
+        Files are only checked for other references once the rows are deleted, trackers sharing a file may all be selected.
         """
-        for obj in queryset:
-            if obj.resume:
-                obj.resume.delete()
+        resumes = [obj.resume for obj in queryset.only('resume')]
         super().delete_queryset(request, queryset)
+        transaction.on_commit(lambda: CompanyTrack.delete_unreferenced_resumes(resumes))
 
 
 class LicenseAdmin(admin.ModelAdmin):
@@ -143,7 +194,7 @@ class WebsiteAdmin(admin.ModelAdmin):
         fields (tuple): A tuple containing the names of the fields to be displayed in the form in the admin interface.
     """
 
-    list_display = ['name', 'url', 'license_key']
+    list_display = ['name', 'url', 'license_key', 'total_visits', 'duplicate_visits', 'bot_visits']
 
     search_fields = ['name']
 
@@ -162,6 +213,7 @@ class ResumeAdmin(admin.ModelAdmin):
         Overrides the delete_model method of the ModelAdmin to delete the resume file associated with the Resume object.
         """
         if obj.file:
+            invalidate_cached_file(obj.file.name)
             obj.file.delete()
         super().delete_model(request, obj)
 
@@ -175,10 +227,12 @@ class ResumeAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Overrides the save_model method of the ModelAdmin to append a random string to the filename of the resume file.
-
+        Overrides the save_model method of the ModelAdmin to append a random string to the filename of a newly
+        uploaded resume file and drop the replaced file from the local file cache.
         """
-        if obj.file:
+        if change and 'file' in form.changed_data and form.initial.get('file'):
+            invalidate_cached_file(form.initial['file'].name)
+        if obj.file and 'file' in form.changed_data:
             # append random string to the filename
             obj.file.name = obj.file.name.split('.')[0] + '_' + self.get_random_string(length=8) + '.' + \
                             obj.file.name.split('.')[1]
@@ -190,6 +244,7 @@ class ResumeAdmin(admin.ModelAdmin):
         """
         for obj in queryset:
             if obj.file:
+                invalidate_cached_file(obj.file.name)
                 obj.file.delete()
         super().delete_queryset(request, queryset)
 
@@ -213,11 +268,14 @@ class BlogAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         """
-        Overrides the save_model method of the ModelAdmin to delete unused images when a blog post is approved.
+        Overrides the save_model method of the ModelAdmin to delete unused images when a blog post is approved, and
+        to drop the cached response of the old slug when it changes.
         """
         if obj.approved:
             obj.delete_unused_images()
         super().save_model(request, obj, form, change)
+        if change and 'slug' in form.changed_data:
+            invalidate_blog_on_commit(form.initial['slug'])
 
     def render_change_form(self, request, context, *args, **kwargs):
         """
@@ -238,13 +296,35 @@ class BlogAdmin(admin.ModelAdmin):
 
     def delete_queryset(self, request, queryset):
         """
-        Overrides the delete_queryset method of the ModelAdmin to delete the images associated with the Blog objects.
+        Overrides the delete_queryset method of the ModelAdmin to delete the images associated with the Blog objects,
+        batched across all of them.
         """
-        for obj in queryset:
-            obj.delete_images(delete_folder=True)
+        Blog.delete_images_of(queryset)
         super().delete_queryset(request, queryset)
 
 
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """
+    This is a Django ModelAdmin for the OutboxEmail model.
+    OutboxEmail Model holds the emails queued for the background sender, including the dead ones that ran out of
+    attempts.
+    """
+
+    list_display = ['subject', 'recipient', 'status', 'attempts', 'next_attempt_at', 'created_date', 'sent_date']
+    list_filter = ['status']
+    readonly_fields = ['attempts', 'last_error', 'created_date', 'sent_date']
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected emails')
+    def requeue(self, request, queryset):
+        """
+        Puts the selected emails back into the outbox to be sent on the next run of the sender.
+        """
+        queryset.exclude(status=OutboxEmail.SENT).update(
+            status=OutboxEmail.PENDING, attempts=0, next_attempt_at=timezone.now(),
+        )
+
+
 # Register admin models
 
 admin.site.register(License, LicenseAdmin)
@@ -254,3 +334,4 @@ admin.site.register(Api)
 admin.site.register(Resume, ResumeAdmin)
 admin.site.register(MainSiteContact)
 admin.site.register(Blog, BlogAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .background import PeriodicTask
+from .models import CompanyTrackOpen
+from .tracking import get_open_buffer
+from .utils import EmailHandler
+
+IMMEDIATE = 'immediate'
+DEBOUNCE = 'debounce'
+DIGEST = 'digest'
+
+
+def record_company_open(company):
+    """
+    Persist an open of a CompanyTrack link and alert about it according to COMPANY_TRACK_ALERT_POLICY.
+
+    ``immediate`` emails every open, ``debounce`` emails only the first open of a tracker within
+    COMPANY_TRACK_ALERT_WINDOW seconds and ``digest`` leaves the open for the next digest email. Opens are
+    written through the open event buffer. ``debounce`` remembers alerts in the default cache, without
+    CACHE_SHARED every worker process debounces on its own.
+    """
+    policy = settings.COMPANY_TRACK_ALERT_POLICY
+    event = CompanyTrackOpen(company=company, notified=True)
+    if policy == DIGEST:
+        event.notified = False
+        start_digest_sender()
+    elif policy != DEBOUNCE or cache.add(f'track-alert:{company.pk}', 1, settings.COMPANY_TRACK_ALERT_WINDOW):
+        # with debounce, an alert sent within the window already covers this open
+        EmailHandler().send_company_track_alert(company)
+    get_open_buffer().add(event)
+    return event
+
+
+def _claim_digest_opens():
+    """
+    Mark the opens not covered by an alert yet as notified and return them, committed before any email is sent.
+    """
+    with transaction.atomic():
+        opens = list(
+            CompanyTrackOpen.objects.select_for_update(skip_locked=True)
+            .filter(notified=False)
+            .select_related('company')
+            .order_by('opened_at')
+        )
+        CompanyTrackOpen.objects.filter(pk__in=[company_open.pk for company_open in opens]).update(notified=True)
+    return opens
+
+
+def send_track_digest():
+    """
+    Send one email summarizing all opens not covered by an alert yet. Returns the number of opens included.
+
+    The opens are claimed in a short transaction and the email is sent after it commits, so no row stays locked
+    during the SMTP round trip. When sending fails the opens are handed back to the next digest.
+    """
+    opens = _claim_digest_opens()
+    if not opens:
+        return 0
+
+    by_company = defaultdict(list)
+    for company_open in opens:
+        by_company[company_open.company].append(company_open.opened_at)
+    entries = [
+        {
+            'company': company,
+            'opens': len(opened),
+            'first_opened': opened[0],
+            'last_opened': opened[-1],
+        }
+        for company, opened in by_company.items()
+    ]
+    handler = EmailHandler()
+    subject = f"Company Track Digest - {len(opens)} opens of {len(entries)} applications"
+    message = render_to_string('main_site/email/track_digest.html', {'entries': entries})
+    try:
+        handler.send_email(subject, handler.job_application_receiver, message)
+    except Exception:
+        CompanyTrackOpen.objects.filter(pk__in=[company_open.pk for company_open in opens]).update(notified=False)
+        raise
+    return len(opens)
+
+
+_digest_sender = None
+
+
+def start_digest_sender():
+    """
+    Start the in-process thread sending digests every COMPANY_TRACK_DIGEST_INTERVAL seconds, when set.
+    """
+    global _digest_sender
+    if _digest_sender is None and settings.COMPANY_TRACK_DIGEST_INTERVAL > 0:
+        _digest_sender = PeriodicTask(settings.COMPANY_TRACK_DIGEST_INTERVAL, send_track_digest,
+                                      name='company-track-digest')
+    if _digest_sender is not None:
+        _digest_sender.start()
@@ -0,0 +1,129 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Trunc
+
+from .db import upsert_increment
+from .hyperloglog import HyperLogLog
+from .models import VisitRollup, UniqueVisitorSketch
+
+ROLLUP_CONFLICT_FIELDS = ['website', 'granularity', 'bucket', 'country', 'city']
+
+
+def hour_bucket(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_rollup_visits(counts):
+    """
+    Upsert hourly rollup rows from a mapping of ``(website_id, bucket, country, city)`` to visit counts.
+    """
+    upsert_increment(VisitRollup, [
+        {
+            'website': website_id,
+            'granularity': VisitRollup.HOUR,
+            'bucket': bucket,
+            'country': country,
+            'city': city,
+            'visits': count,
+        }
+        for (website_id, bucket, country, city), count in counts.items()
+    ], ROLLUP_CONFLICT_FIELDS, 'visits')
+
+
+def merge_visitor_sketches(sketches):
+    """
+    Merge in-memory sketches, a mapping of ``(website_id, day)`` to HyperLogLog, into the stored daily sketches.
+    """
+    for (website_id, day), sketch in sketches.items():
+        with transaction.atomic():
+            stored, created = UniqueVisitorSketch.objects.select_for_update().get_or_create(
+                website_id=website_id, day=day, defaults={'sketch': sketch.to_bytes()},
+            )
+            if not created:
+                stored.sketch = HyperLogLog.from_bytes(stored.sketch).merge(sketch).to_bytes()
+                stored.save(update_fields=['sketch'])
+
+
+def unique_visitors(website, start, end):
+    """
+    Return the approximate number of distinct visitors of a website over ``[start, end)`` and per day.
+    """
+    total = None
+    days = []
+    sketches = UniqueVisitorSketch.objects.filter(website=website, day__gte=start, day__lt=end).order_by('day')
+    for stored in sketches.iterator():
+        sketch = HyperLogLog.from_bytes(stored.sketch)
+        days.append({'day': stored.day, 'uniques': sketch.count()})
+        total = sketch if total is None else total.merge(sketch)
+    return (total.count() if total is not None else 0), days
+
+
+def compact_hourly_rollups(before):
+    """
+    Fold hourly rollup rows of the days before ``before`` into daily rows.
+
+    Returns the number of hourly rows removed.
+    """
+    cutoff = day_bucket(before)
+    with transaction.atomic():
+        hourly = VisitRollup.objects.select_for_update().filter(granularity=VisitRollup.HOUR, bucket__lt=cutoff)
+        pks = list(hourly.values_list('pk', flat=True))
+        if not pks:
+            return 0
+        daily = (
+            VisitRollup.objects.filter(pk__in=pks)
+            .annotate(day=Trunc('bucket', 'day'))
+            .values('website', 'day', 'country', 'city')
+            .annotate(total=Sum('visits'))
+            .order_by()
+        )
+        upsert_increment(VisitRollup, [
+            {
+                'website': row['website'],
+                'granularity': VisitRollup.DAY,
+                'bucket': row['day'],
+                'country': row['country'],
+                'city': row['city'],
+                'visits': row['total'],
+            }
+            for row in daily
+        ], ROLLUP_CONFLICT_FIELDS, 'visits')
+        VisitRollup.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def visit_series(website, start, end, granularity=VisitRollup.DAY, group_by=None):
+    """
+    Return visits of a website between ``start`` and ``end`` summed per ``granularity`` period, optionally split
+    by ``country`` or ``city``.
+
+    Reads only the pre-aggregated rollup rows. Hourly and daily rows never overlap, so both are summed together.
+    Periods that have already been compacted into daily rows report their total at midnight.
+    """
+    fields = ['period'] + (['country', 'city'] if group_by == 'city' else ['country'] if group_by else [])
+    rows = (
+        VisitRollup.objects.filter(website=website, bucket__gte=start, bucket__lt=end)
+        .annotate(period=Trunc('bucket', granularity))
+        .values(*fields)
+        .annotate(visits=Sum('visits'))
+        .order_by(*fields)
+    )
+    return list(rows)
+
+
+def parse_range(start, end, default_days=7, now=None):
+    """
+    Turn optional ISO date strings into a ``[start, end)`` datetime range, ``end`` being inclusive as a date.
+    """
+    today = day_bucket(now or datetime.datetime.now(datetime.timezone.utc))
+    end = datetime.datetime.combine(datetime.date.fromisoformat(end), datetime.time(), today.tzinfo) \
+        if end else today
+    start = datetime.datetime.combine(datetime.date.fromisoformat(start), datetime.time(), today.tzinfo) \
+        if start else end - datetime.timedelta(days=default_days - 1)
+    return start, end + datetime.timedelta(days=1)
@@ -1,8 +1,22 @@
 from django.urls import path
-from .views import main_resume, contact_send_email, BlogDetailView
+from .views import (
+    main_resume,
+    contact_send_email,
+    BlogListView,
+    BlogExportView,
+    BlogSearchView,
+    BlogDetailView,
+    WebsiteVisitsView,
+    UniqueVisitorsView,
+)
 
 urlpatterns = [
     path('resume/', main_resume, name='resume'),
     path('email/', contact_send_email, name='contact_send_email'),
+    path('blog/', BlogListView.as_view(), name='blog_list'),
+    path('blog/export/', BlogExportView.as_view(), name='blog_export'),
+    path('blog/search/', BlogSearchView.as_view(), name='blog_search'),
     path('blog/<str:slug>/', BlogDetailView.as_view(), name='get_blog'),
+    path('visits/', WebsiteVisitsView.as_view(), name='website_visits'),
+    path('visits/uniques/', UniqueVisitorsView.as_view(), name='unique_visitors'),
 ]
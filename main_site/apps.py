@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MainSiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main_site'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,60 @@
+import atexit
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Call ``func`` every ``interval`` seconds on a daemon thread.
+
+    The task runs one last time when it is stopped, which also happens at interpreter shutdown, so work buffered
+    in memory is not lost when a worker exits. Stale database connections of the thread are closed around
+    every run.
+    """
+
+    def __init__(self, interval, func, name=None):
+        self.interval = interval
+        self.func = func
+        self.name = name or getattr(func, '__qualname__', 'periodic-task')
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _call(self):
+        try:
+            self.func()
+        except Exception:
+            logger.exception('Periodic task %s failed', self.name)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # the thread keeps its own database connections, drop those the server closed or that outlived
+            # CONN_MAX_AGE like the request cycle does
+            close_old_connections()
+            try:
+                self._call()
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        self._call()
+        self._stop.clear()
+        atexit.unregister(self.stop)
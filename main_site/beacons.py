@@ -0,0 +1,107 @@
+import hashlib
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .visits import BOT_VISITS, DUPLICATE_VISITS
+
+BOT_PATTERN = re.compile(
+    r'bot|crawl|spider|slurp|archiver|headless|phantomjs|selenium|puppeteer|playwright|lighthouse|pingdom'
+    r'|uptime|monitor|preview|facebookexternalhit|embedly|curl|wget|python-requests|python-urllib|httpclient'
+    r'|okhttp|go-http-client|java/|libwww|scrapy|axios|node-fetch',
+    re.IGNORECASE,
+)
+
+
+def is_bot(user_agent):
+    """
+    Cheap user agent check for crawlers, monitors, link previewers and scripted clients.
+    """
+    return not user_agent or BOT_PATTERN.search(user_agent) is not None
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+
+class RotatingBloomFilter:
+    """
+    Remembers keys for a sliding time window using two Bloom filter generations.
+
+    Keys go into the current generation and are looked up in both. Every ``window`` seconds the current
+    generation becomes the previous one and the old previous one is dropped, so a key is remembered for at least
+    ``window`` and at most twice ``window`` seconds. ``capacity`` is the number of keys expected per window.
+    """
+
+    def __init__(self, window, capacity=100000, error_rate=0.001, clock=time.monotonic):
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = clock()
+
+    def _rotate(self):
+        if self._clock() - self._rotated_at >= self.window:
+            self._previous, self._current = self._current, BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = self._clock()
+
+    def seen(self, key):
+        """
+        Return True when the key was already seen within the window, otherwise remember it and return False.
+        """
+        with self._lock:
+            self._rotate()
+            if key in self._current or key in self._previous:
+                return True
+            self._current.add(key)
+            return False
+
+
+_beacon_filter = None
+
+
+def get_beacon_filter():
+    """
+    Return the process wide duplicate beacon filter, or None when BEACON_DEDUP_WINDOW is 0.
+    """
+    global _beacon_filter
+    if _beacon_filter is None and settings.BEACON_DEDUP_WINDOW > 0:
+        _beacon_filter = RotatingBloomFilter(settings.BEACON_DEDUP_WINDOW, settings.BEACON_DEDUP_CAPACITY)
+    return _beacon_filter
+
+
+def beacon_key(license_key, ip_address, user_agent):
+    return f'{license_key}|{ip_address}|{user_agent}'
+
+
+def suppression_reason(license_key, ip_address, user_agent):
+    """
+    Return the Website counter a beacon should be counted in instead of total_visits, or None to count it.
+    """
+    if settings.BEACON_FILTER_BOTS and is_bot(user_agent):
+        return BOT_VISITS
+    beacon_filter = get_beacon_filter()
+    if beacon_filter is not None and beacon_filter.seen(beacon_key(license_key, ip_address, user_agent)):
+        return DUPLICATE_VISITS
+    return None
@@ -0,0 +1,71 @@
+import base64
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Blog
+
+SUMMARY_FIELDS = ['id', 'title', 'slug', 'created_date', 'approved', 'active', 'excerpt', 'reading_time']
+ARCHIVE_FIELDS = ['title', 'slug', 'created_date', 'excerpt', 'reading_time', 'content']
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def published_blogs():
+    """
+    Approved and active posts, newest first, in the order of the ``blog_published_recent`` index.
+    """
+    return Blog.objects.filter(approved=True, active=True).order_by('-created_date', '-id')
+
+
+def encode_cursor(blog):
+    position = f'{blog["created_date"].isoformat()}|{blog["id"]}'
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_date, pk = position.rsplit('|', 1)
+        return datetime.datetime.fromisoformat(created_date), int(pk)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise InvalidCursor(cursor) from error
+
+
+def blog_page(cursor=None, limit=None):
+    """
+    Return ``(summaries, next_cursor)`` of the published posts after ``cursor``.
+
+    Pages are cut on ``(created_date, id)`` instead of an offset, so every page costs one index range scan no
+    matter how deep it is. Summaries are dicts of SUMMARY_FIELDS, the content is never loaded.
+    """
+    limit = min(limit or settings.BLOG_PAGE_SIZE, settings.BLOG_MAX_PAGE_SIZE)
+    blogs = published_blogs()
+    if cursor:
+        created_date, pk = decode_cursor(cursor)
+        blogs = blogs.filter(Q(created_date__lt=created_date) | Q(created_date=created_date, id__lt=pk))
+    summaries = list(blogs.values(*SUMMARY_FIELDS)[:limit + 1])
+    next_cursor = encode_cursor(summaries[limit - 1]) if len(summaries) > limit else None
+    return summaries[:limit], next_cursor
+
+
+def blog_archive_json(chunk_size=None):
+    """
+    Yield the published posts with their content as a JSON array, one post per chunk.
+
+    Rows are fetched ``chunk_size`` at a time with a server side cursor where the database has one, so memory
+    stays flat however large the archive is.
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    chunk_size = chunk_size or settings.BLOG_EXPORT_CHUNK_SIZE
+    rows = published_blogs().values(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size)
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + encoder.encode(row)
+        separator = ','
+    yield ']'
@@ -0,0 +1,105 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.renderers import JSONRenderer
+
+from .serializers import body_etag
+
+LIST = '__list__'
+
+
+def _digest(value):
+    # slugs and cursors come from the URL, keep cache keys short and free of unsafe characters
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def _version_key(scope):
+    return f'blog:version:{_digest(scope)}'
+
+
+def _entry_key(scope, version, key):
+    return f'blog:response:{_digest(scope)}:{version}:{_digest(key)}'
+
+
+def blog_list_version():
+    """
+    Return a number that changes whenever any post changes.
+    """
+    return cache.get(_version_key(LIST), 0)
+
+
+def invalidate_blog(*slugs):
+    """
+    Drop the cached detail responses of ``slugs`` and every cached list page.
+
+    Entries are never deleted, the version of each scope is bumped so a rebuild that started before the change
+    stores its result under a key nobody reads any more. Only workers sharing the cache see the bump, the others
+    serve their entries until BLOG_CACHE_TTL runs out.
+    """
+    for scope in (LIST,) + tuple(slug for slug in slugs if slug):
+        cache.add(_version_key(scope), 0, timeout=None)
+        cache.incr(_version_key(scope))
+
+
+def invalidate_blog_on_commit(*slugs):
+    transaction.on_commit(lambda: invalidate_blog(*slugs))
+
+
+def _get_or_build(key, build, timeout):
+    """
+    Return the cached entry of ``key``, building it in only one worker at a time and caching it for
+    ``timeout(entry)`` seconds.
+
+    Other workers wait for that build for up to BLOG_CACHE_LOCK_TIMEOUT seconds and build it themselves
+    afterwards, in case the lock holder died.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + settings.BLOG_CACHE_LOCK_TIMEOUT
+    while not cache.add(lock_key, 1, settings.BLOG_CACHE_LOCK_TIMEOUT):
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if time.monotonic() >= deadline:
+            return build()
+    try:
+        entry = build()
+        cache.set(key, entry, timeout(entry))
+    finally:
+        cache.delete(lock_key)
+    return entry
+
+
+def cached_blog_response(request, scope, key, build):
+    """
+    Answer ``request`` from the response cache of a slug, or of the list pages when ``scope`` is LIST.
+
+    ``build()`` returns ``(status, data)`` and is only called on a miss. Cached responses carry a strong ETag of
+    the rendered body, a matching ``If-None-Match`` gets a 304. Anything but a 200 is only cached for
+    BLOG_CACHE_ERROR_TTL seconds, unknown slugs must not fill the cache for a whole BLOG_CACHE_TTL.
+    """
+    version = cache.get(_version_key(scope), 0)
+
+    def render():
+        status, data = build()
+        body = JSONRenderer().render(data)
+        return status, body, body_etag(body)
+
+    def timeout(entry):
+        return settings.BLOG_CACHE_TTL if entry[0] == 200 else settings.BLOG_CACHE_ERROR_TTL
+
+    status, body, etag = _get_or_build(_entry_key(scope, version, key), render, timeout)
+    response = get_conditional_response(request, etag=etag) if status == 200 else None
+    if response is None:
+        response = HttpResponse(body, status=status, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.BLOG_CACHE_MAX_AGE)
+    return response
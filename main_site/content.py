@@ -0,0 +1,178 @@
+import math
+import re
+from html.parser import HTMLParser
+
+from django.utils.html import escape
+from django.utils.text import slugify
+
+# Tags whose end starts a new line of text
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure', 'footer',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th',
+    'tr', 'ul',
+}
+SKIPPED_TAGS = {'script', 'style', 'template'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+WHITESPACE = re.compile(r'\s+')
+# an <img> start tag, quoted attribute values may contain ">"
+IMG_TAG = re.compile(r'''<img\b(?:[^>"']|"[^"]*"|'[^']*')*>''', re.IGNORECASE)
+# an id attribute without a value, replaced when a heading gets its generated id
+EMPTY_ID = re.compile(r'''\s+id(?:\s*=\s*(?:""|''))?(?=[\s/>])''', re.IGNORECASE)
+
+
+class ContentParser(HTMLParser):
+    """
+    Collects the text and headings of an HTML fragment in one pass, without building a tree.
+
+    Headings are ``(level, id, text, position, start_tag)`` tuples, ``position`` is the ``(line, column)`` of
+    ``start_tag``, the source of the heading's start tag.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.headings = []
+        self._skipping = 0
+        self._heading = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+        if tag in HEADING_TAGS:
+            self._heading = (int(tag[1]), dict(attrs).get('id'), [], self.getpos(), self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+        if tag in HEADING_TAGS and self._heading is not None:
+            level, anchor, parts, position, start_tag = self._heading
+            text = WHITESPACE.sub(' ', ''.join(parts)).strip()
+            if text:
+                self.headings.append((level, anchor, text, position, start_tag))
+            self._heading = None
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+            if self._heading is not None:
+                self._heading[2].append(data)
+
+    def text(self):
+        lines = (WHITESPACE.sub(' ', line).strip() for line in ''.join(self.parts).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+
+def _parse(html):
+    parser = ContentParser()
+    parser.feed(html or '')
+    parser.close()
+    return parser
+
+
+def html_to_text(html):
+    """
+    Return the visible text of CKEditor HTML, one line per block element.
+    """
+    return _parse(html).text()
+
+
+def excerpt(text, length):
+    """
+    Return the start of ``text`` on one line, cut on a word boundary to at most ``length`` characters.
+    """
+    text = WHITESPACE.sub(' ', text).strip()
+    if len(text) <= length:
+        return text
+    cut = text.rfind(' ', 0, length)
+    return text[:cut if cut > 0 else length].rstrip(' ,.;:') + '…'
+
+
+def _add_heading_ids(html, anchors):
+    """
+    Return ``html`` with ids set on the heading start tags at the ``(line, column)`` keys of ``anchors``, which
+    map to ``(start_tag, id)``. An empty ``id`` attribute of the tag is replaced.
+    """
+    if not anchors:
+        return html
+    line_starts = [0] + [match.end() for match in re.finditer('\n', html)]
+    parts, last = [], 0
+    for (line, column), (start_tag, anchor) in sorted(anchors.items()):
+        offset = line_starts[line - 1] + column
+        tag = EMPTY_ID.sub('', start_tag)
+        # after the "<hN" of the start tag
+        parts += [html[last:offset], tag[:3], f' id="{escape(anchor)}"', tag[3:]]
+        last = offset + len(start_tag)
+    parts.append(html[last:])
+    return ''.join(parts)
+
+
+def analyze_content(html, excerpt_length=300, words_per_minute=200):
+    """
+    Parse CKEditor HTML once and return everything derived from it.
+
+    Returns a dict of ``plain_text``, ``excerpt``, ``word_count``, ``reading_time`` in minutes, ``toc``, a list of
+    ``{"level", "id", "text"}`` headings whose ids are the heading's own or a unique slug of its text, and
+    ``content``, the HTML with those slugs added as the ``id`` of their headings so the ``toc`` links resolve.
+    """
+    html = html or ''
+    parser = _parse(html)
+    plain_text = parser.text()
+    word_count = len(plain_text.split())
+    toc = []
+    used = {anchor for _, anchor, _, _, _ in parser.headings if anchor}
+    added = {}
+    for level, anchor, text, position, start_tag in parser.headings:
+        if not anchor:
+            base = slugify(text) or 'section'
+            anchor, number = base, 1
+            while anchor in used:
+                number += 1
+                anchor = f'{base}-{number}'
+            used.add(anchor)
+            added[position] = (start_tag, anchor)
+        toc.append({'level': level, 'id': anchor, 'text': text})
+    return {
+        'plain_text': plain_text,
+        'excerpt': excerpt(plain_text, excerpt_length),
+        'word_count': word_count,
+        'reading_time': math.ceil(word_count / words_per_minute),
+        'toc': toc,
+        'content': _add_heading_ids(html, added),
+    }
+
+
+class ImageSourceParser(HTMLParser):
+    """
+    Collects ``<img src>`` values and nothing else, text and entities are never decoded.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'img':
+            for name, value in attrs:
+                if name == 'src' and value:
+                    self.urls.append(value)
+                    break
+
+    handle_startendtag = handle_starttag
+
+
+def extract_image_urls(html):
+    """
+    Return the distinct image sources of an HTML fragment in document order.
+
+    Only the ``<img>`` tags found by IMG_TAG are tokenized, the rest of the document is skipped. An ``<img>``
+    inside a comment or script is reported too, which errs on the side of keeping an image.
+    """
+    parser = ImageSourceParser()
+    for match in IMG_TAG.finditer(html or ''):
+        parser.feed(match.group())
+    parser.close()
+    return list(dict.fromkeys(parser.urls))
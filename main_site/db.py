@@ -0,0 +1,34 @@
+from django.db import connection
+
+
+def upsert_increment(model, rows, conflict_fields, increment_field):
+    """
+    Insert rows, adding ``increment_field`` onto the existing row when one with the same ``conflict_fields``
+    already exists.
+
+    Runs a single ``INSERT ... ON CONFLICT DO UPDATE`` statement per row, which PostgreSQL and SQLite both
+    support. ``conflict_fields`` must be covered by a unique constraint on the model.
+    """
+    if not rows:
+        return
+    opts = model._meta
+    fields = [opts.get_field(name) for name in rows[0]]
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    increment_column = quote(opts.get_field(increment_field).column)
+    sql = (
+        'INSERT INTO {table} ({columns}) VALUES ({values}) '
+        'ON CONFLICT ({conflict}) DO UPDATE SET {field} = {table}.{field} + EXCLUDED.{field}'
+    ).format(
+        table=table,
+        columns=', '.join(quote(field.column) for field in fields),
+        values=', '.join(['%s'] * len(fields)),
+        conflict=', '.join(quote(opts.get_field(name).column) for name in conflict_fields),
+        field=increment_column,
+    )
+    params = [
+        [field.get_db_prep_save(row[field.name], connection) for field in fields]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
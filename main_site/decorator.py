@@ -1,6 +1,6 @@
 from functools import wraps
 from django.http import HttpResponseForbidden
-from .models import License, Website
+from .licenses import get_license_entitlement
 
 
 def check_license(api_name):
@@ -8,12 +8,12 @@ def check_license(api_name):
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
             license_key = request.GET.get('id')
-            try:
-                license = License.objects.get(license_key=license_key)
-            except License.DoesNotExist:
+            entitlement = get_license_entitlement(license_key)
+            if entitlement is None:
                 return HttpResponseForbidden()
 
-            if license.active and license.apis.filter(name=api_name).exists():
+            active, api_names = entitlement
+            if active and api_name in api_names:
                 return view_func(request, *args, **kwargs)
             else:
                 print('License is not active')
@@ -22,4 +22,3 @@ def check_license(api_name):
         return _wrapped_view
 
     return decorator
-
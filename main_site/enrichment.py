@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .background import PeriodicTask
+from .models import PendingVisit
+from .utils import get_ip_address_data_many
+from .visits import get_visit_buffer
+
+
+def resolve_pending_visits(limit=1000):
+    """
+    Geolocate up to ``limit`` pending visits and count them.
+
+    Distinct IPs are resolved in one batch before any row is locked, so a slow or unavailable provider never holds
+    a transaction open. The resolved visits are then counted and deleted in one short transaction, skipping those
+    another worker counted meanwhile. Visits whose lookup could not be made because the provider is unavailable
+    stay pending for the next run; visits whose lookup failed are counted without a location.
+    Returns the number of visits counted.
+    """
+    pending = list(PendingVisit.objects.order_by('pk').values_list('pk', 'ip_address')[:limit])
+    if not pending:
+        return 0
+    locations = get_ip_address_data_many([ip_address for _, ip_address in pending])
+    resolvable = [pk for pk, ip_address in pending if ip_address in locations]
+    if not resolvable:
+        return 0
+
+    with transaction.atomic():
+        claimed = PendingVisit.objects.select_for_update(skip_locked=True).filter(pk__in=resolvable).order_by('pk')
+        visits = defaultdict(list)
+        resolved = []
+        for visit in claimed:
+            location_data = locations[visit.ip_address] or {}
+            ip_address = location_data.get('query', visit.ip_address) if settings.VISIT_STORE_IP_ADDRESS else ''
+            visits[visit.website_id].append({
+                'country': location_data.get('country'),
+                'city': location_data.get('city'),
+                'zip': location_data.get('zip'),
+                'ip_address': ip_address,
+                'visited_at': visit.visited_at,
+                'visitor_id': visit.ip_address,
+            })
+            resolved.append(visit.pk)
+
+        buffer = get_visit_buffer()
+        for website_id, website_visits in visits.items():
+            buffer.add_many(website_id, website_visits)
+        PendingVisit.objects.filter(pk__in=resolved).delete()
+    return len(resolved)
+
+
+def resolve_all_pending_visits():
+    while resolve_pending_visits(settings.GEOLOCATION_WORKER_BATCH_SIZE):
+        pass
+
+
+_worker = None
+
+
+def start_enrichment_worker():
+    """
+    Start the in-process thread resolving pending visits, when GEOLOCATION_WORKER_INTERVAL is set.
+    """
+    global _worker
+    if _worker is None and settings.GEOLOCATION_WORKER_INTERVAL > 0:
+        _worker = PeriodicTask(settings.GEOLOCATION_WORKER_INTERVAL, resolve_all_pending_visits,
+                               name='geolocation-worker')
+    if _worker is not None:
+        _worker.start()
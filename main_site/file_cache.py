@@ -0,0 +1,180 @@
+import datetime
+import hashlib
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+
+class CachedFile:
+    """
+    A cached copy of a stored file, with the same interface as ``file_delivery.StoredFile``.
+
+    The ETag is the SHA-256 of the content, ``path`` lets full downloads be sent with ``sendfile``.
+    """
+
+    def __init__(self, path, digest, last_modified):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.last_modified = last_modified
+        self.etag = f'"{digest}"'
+
+    def chunks(self, start, end, chunk_size):
+        try:
+            self.file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = self.file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        self.file.close()
+
+
+class DiskFileCache:
+    """
+    Read-through cache of storage files on local disk, bounded to ``max_bytes``.
+
+    Content lives in ``blobs/<sha256>`` so files with the same content are stored once, and a small pointer file
+    per storage name in ``names/`` records the digest and the remote modification time. Every file is written to
+    a temporary file and renamed into place, so concurrent workers never see partial entries. Reading a blob
+    touches its mtime and the least recently used blobs are removed once the budget is exceeded. Files larger
+    than the budget are never cached.
+
+    Stored names are treated as immutable until ``invalidate`` is called for them.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._blobs = os.path.join(directory, 'blobs')
+        self._names = os.path.join(directory, 'names')
+        self._lock = threading.Lock()
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._names, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(settings.FILE_CACHE_DIR, settings.FILE_CACHE_MAX_BYTES)
+
+    def _pointer_path(self, name):
+        return os.path.join(self._names, hashlib.sha1(name.encode('utf-8')).hexdigest())
+
+    def _write_atomic(self, path, chunks):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in chunks:
+                    tmp_file.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _lookup(self, name):
+        try:
+            with open(self._pointer_path(name)) as pointer:
+                digest, timestamp = pointer.read().split()
+            cached = CachedFile(os.path.join(self._blobs, digest), digest,
+                                datetime.datetime.fromtimestamp(float(timestamp), datetime.timezone.utc))
+        except (OSError, ValueError):
+            return None
+        os.utime(cached.path)
+        return cached
+
+    def _store(self, name, source):
+        sha256 = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in source.chunks(0, source.size - 1, settings.RESUME_CHUNK_SIZE):
+                    sha256.update(chunk)
+                    tmp_file.write(chunk)
+            digest = sha256.hexdigest()
+            os.replace(tmp_path, os.path.join(self._blobs, digest))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._write_atomic(self._pointer_path(name), [f'{digest} {source.last_modified.timestamp()}'.encode()])
+        self._evict(keep=digest)
+
+    def _evict(self, keep):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self._blobs):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, digest in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if digest != keep:
+                    try:
+                        os.unlink(os.path.join(self._blobs, digest))
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+
+    def open(self, name, open_source):
+        """
+        Return the CachedFile of a storage name, calling ``open_source()`` to fetch it on a miss.
+
+        The source must provide ``size``, ``last_modified``, ``chunks(start, end, chunk_size)`` and ``close()``.
+        When it is too large to cache the source itself is returned.
+        """
+        cached = self._lookup(name)
+        if cached is not None:
+            return cached
+        source = open_source()
+        if source.size > self.max_bytes:
+            return source
+        try:
+            self._store(name, source)
+        finally:
+            source.close()
+        # evicted by another worker in the meantime
+        return self._lookup(name) or open_source()
+
+    def invalidate(self, name):
+        """
+        Forget a storage name, its content stays until evicted in case another name shares it.
+        """
+        try:
+            os.unlink(self._pointer_path(name))
+        except FileNotFoundError:
+            pass
+
+    def size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self._blobs))
+
+
+_file_cache = None
+
+
+def get_file_cache():
+    """
+    Return the process wide disk cache, or None when FILE_CACHE_MAX_BYTES is 0.
+    """
+    global _file_cache
+    if _file_cache is None and settings.FILE_CACHE_MAX_BYTES > 0:
+        _file_cache = DiskFileCache.from_settings()
+    return _file_cache
+
+
+def invalidate_cached_file(name):
+    """
+    Drop a storage name from the disk cache, if there is one.
+    """
+    file_cache = get_file_cache()
+    if file_cache is not None and name:
+        file_cache.invalidate(name)
@@ -0,0 +1,186 @@
+import hashlib
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_etags, quote_etag
+
+from .file_cache import get_file_cache
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Return the inclusive ``(start, end)`` of a single range ``Range`` header, or None to send the whole file.
+
+    Multiple ranges are answered with the whole file, which the RFC allows. Raises RangeNotSatisfiable for a
+    range that lies outside the file.
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+class StoredFile:
+    """
+    A file in a storage backend with the metadata needed for conditional and range requests.
+
+    S3 objects are described by one HEAD request and read with ranged GETs, so only the requested bytes leave
+    the bucket. Other storages are opened and seeked.
+    """
+
+    # only set for local copies that can be sent with sendfile
+    path = None
+
+    def __init__(self, storage, name):
+        self.storage = storage
+        self.name = name
+        self._file = storage.open(name, 'rb')
+        self._object = getattr(self._file, 'obj', None)
+        if self._object is not None:
+            self.size = self._object.content_length
+            self.last_modified = self._object.last_modified
+            self.etag = self._object.e_tag
+        else:
+            self.size = storage.size(name)
+            self.last_modified = storage.get_modified_time(name)
+            self.etag = quote_etag(hashlib.md5(
+                f'{name}:{self.size}:{self.last_modified.timestamp()}'.encode()
+            ).hexdigest())
+
+    def chunks(self, start, end, chunk_size):
+        try:
+            if self._object is not None:
+                body = self._object.get(Range=f'bytes={start}-{end}')['Body']
+                try:
+                    yield from body.iter_chunks(chunk_size)
+                finally:
+                    body.close()
+                return
+            self._file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = self._file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+
+def presigned_url(storage, name, filename=None, as_attachment=False):
+    """
+    Return a short lived signed URL of the file, or None when the storage does not sign URLs.
+    """
+    if not getattr(storage, 'querystring_auth', False):
+        return None
+    parameters = {'ResponseContentDisposition': content_disposition_header(as_attachment, filename)} \
+        if filename else None
+    return storage.url(name, parameters=parameters, expire=settings.RESUME_URL_EXPIRE)
+
+
+def _range_allowed(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return etag in parse_etags(if_range)
+    return if_range == http_date(last_modified.timestamp())
+
+
+def open_stored_file(storage, name):
+    """
+    Return the StoredFile of a name, or its local copy when FILE_CACHE_MAX_BYTES enables the disk cache.
+    """
+    file_cache = get_file_cache()
+    if file_cache is None:
+        return StoredFile(storage, name)
+    return file_cache.open(name, lambda: StoredFile(storage, name))
+
+
+def stream_file(request, storage, name, filename=None, as_attachment=False, etag=None):
+    """
+    Stream a stored file through the worker with ``Range``, ``ETag`` and ``Last-Modified`` support.
+
+    Whole local copies are sent with FileResponse so the server can use ``sendfile``. ``etag`` replaces the ETag
+    of the storage, for callers that already know a checksum of the content.
+    """
+    stored = open_stored_file(storage, name)
+    if etag is not None:
+        stored.etag = etag
+    last_modified = int(stored.last_modified.timestamp())
+    response = get_conditional_response(request, etag=stored.etag, last_modified=last_modified)
+    byte_range = None
+    if response is None and _range_allowed(request, stored.etag, stored.last_modified):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stored.size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stored.size}'
+
+    if response is not None:
+        stored.close()
+        response['ETag'] = stored.etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    start, end = byte_range or (0, stored.size - 1)
+    status = 206 if byte_range else 200
+    if request.method == 'HEAD' or stored.size == 0:
+        stored.close()
+        response = HttpResponse(status=status)
+    elif stored.path and not byte_range:
+        response = FileResponse(stored.file)
+    else:
+        response = StreamingHttpResponse(stored.chunks(start, end, settings.RESUME_CHUNK_SIZE), status=status)
+    response['Content-Length'] = end - start + 1
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{stored.size}'
+    content_type, _ = mimetypes.guess_type(filename or name)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = stored.etag
+    response['Last-Modified'] = http_date(last_modified)
+    if filename:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    patch_cache_control(response, private=True, max_age=settings.RESUME_CACHE_MAX_AGE)
+    return response
+
+
+def deliver_file(request, field_file, filename=None, as_attachment=False, etag=None):
+    """
+    Answer a download of a FileField value the way RESUME_DELIVERY asks.
+
+    ``redirect`` sends the browser to a presigned URL that expires after RESUME_URL_EXPIRE seconds, falling back to
+    ``proxy`` for storages that cannot sign URLs. ``proxy`` streams the file with ``stream_file``.
+    """
+    storage, name = field_file.storage, field_file.name
+    if settings.RESUME_DELIVERY == 'redirect':
+        url = presigned_url(storage, name, filename, as_attachment)
+        if url is not None:
+            response = HttpResponseRedirect(url)
+            # never let a browser follow a cached redirect to an expired signature
+            patch_cache_control(response, private=True, max_age=settings.RESUME_URL_EXPIRE // 2)
+            return response
+    return stream_file(request, storage, name, filename, as_attachment, etag)
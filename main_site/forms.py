@@ -19,3 +19,9 @@ class BlogAddForm(forms.ModelForm):
 
 class AuthenticateWithPasswordForm(forms.Form):
     password = forms.CharField(widget=forms.PasswordInput)
+
+
+class CompanyTrackImportUploadForm(forms.Form):
+    file = forms.FileField(help_text='CSV or JSON lines with company_name, position, country, city, url, note, '
+                                     'applied_date and optionally resume columns')
+    resume = forms.CharField(required=False, help_text='Storage name of an uploaded resume for rows without one')
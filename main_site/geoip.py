@@ -0,0 +1,184 @@
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+from django.conf import settings
+
+# Index layout, all integers little endian:
+#   header    magic, version, record count, location count
+#   records   start address, end address (16 byte big endian IPv6, IPv4 is mapped into ::ffff:0:0/96), location index
+#   locations offset and length of each location inside the string table
+#   strings   utf-8 "country\x1fcity\x1fzip" entries
+MAGIC = b'GEOIPIDX'
+VERSION = 1
+HEADER = struct.Struct('<8sIII')
+RECORD = struct.Struct('<16s16sI')
+LOCATION = struct.Struct('<II')
+SEPARATOR = '\x1f'
+
+_IPV4_MAPPED = 0xFFFF << 32
+# Remembered by get_geoip_database when the configured index cannot be opened
+_NO_INDEX = object()
+
+logger = logging.getLogger(__name__)
+
+
+class GeoIPIndexError(Exception):
+    pass
+
+
+def _address_key(ip_address):
+    """
+    Return the 16 byte sort key of an IPv4 or IPv6 address.
+    """
+    address = ipaddress.ip_address(ip_address)
+    value = int(address)
+    if address.version == 4:
+        value |= _IPV4_MAPPED
+    return value.to_bytes(16, 'big')
+
+
+def _first(row, *names):
+    for name in names:
+        value = row.get(name)
+        if value:
+            return value.strip()
+    return ''
+
+
+def _row_range(row):
+    network = _first(row, 'network', 'cidr')
+    if network:
+        network = ipaddress.ip_network(network, strict=False)
+        return _address_key(network.network_address), _address_key(network.broadcast_address)
+    return _address_key(_first(row, 'start_ip', 'ip_start')), _address_key(_first(row, 'end_ip', 'ip_end'))
+
+
+def build_index(csv_path, output_path):
+    """
+    Build a binary range index from an IP range CSV.
+
+    Each row needs either a ``network`` (CIDR) column or ``start_ip``/``end_ip`` columns, plus ``country``,
+    ``city`` and ``zip`` (``country_name``, ``city_name`` and ``postal_code`` are accepted too, as found in
+    GeoLite style dumps). Returns the number of ranges written.
+    """
+    locations = {}
+    records = []
+    with open(csv_path, newline='', encoding='utf-8') as csv_file:
+        for row in csv.DictReader(csv_file):
+            start, end = _row_range(row)
+            location = SEPARATOR.join((
+                _first(row, 'country', 'country_name'),
+                _first(row, 'city', 'city_name'),
+                _first(row, 'zip', 'postal_code'),
+            ))
+            records.append((start, end, locations.setdefault(location, len(locations))))
+    records.sort()
+
+    strings = bytearray()
+    location_table = bytearray()
+    for location in locations:
+        encoded = location.encode('utf-8')
+        location_table += LOCATION.pack(len(strings), len(encoded))
+        strings += encoded
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as index_file:
+            index_file.write(HEADER.pack(MAGIC, VERSION, len(records), len(locations)))
+            for record in records:
+                index_file.write(RECORD.pack(*record))
+            index_file.write(location_table)
+            index_file.write(strings)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(records)
+
+
+class GeoIPDatabase:
+    """
+    Read only view of an index built by ``build_index``.
+
+    The file is memory mapped and searched in place, nothing is parsed up front.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.record_count, self.location_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise GeoIPIndexError(f'{path} is not a geoip index')
+        self._locations_offset = HEADER.size + self.record_count * RECORD.size
+        self._strings_offset = self._locations_offset + self.location_count * LOCATION.size
+
+    def close(self):
+        self._map.close()
+
+    def _start_key(self, index):
+        offset = HEADER.size + index * RECORD.size
+        return self._map[offset:offset + 16]
+
+    def _location(self, index):
+        offset, length = LOCATION.unpack_from(self._map, self._locations_offset + index * LOCATION.size)
+        start = self._strings_offset + offset
+        return self._map[start:start + length].decode('utf-8').split(SEPARATOR)
+
+    def lookup(self, ip_address):
+        """
+        Return the location of an address in the same shape as ip-api.com, or None when no range matches.
+        """
+        try:
+            key = _address_key(ip_address)
+        except ValueError:
+            return None
+
+        # find the last range starting at or before the address
+        low, high = 0, self.record_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._start_key(middle) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+
+        _, end, location_index = RECORD.unpack_from(self._map, HEADER.size + (low - 1) * RECORD.size)
+        if key > end:
+            return None
+        country, city, zip_code = self._location(location_index)
+        return {
+            'status': 'success',
+            'country': country,
+            'city': city,
+            'zip': zip_code,
+            'query': ip_address,
+        }
+
+
+_database = None
+
+
+def get_geoip_database():
+    """
+    Return the process wide database opened from settings.GEOIP_INDEX_PATH, or None when there is no usable index.
+
+    A missing or invalid index is reported once and remembered, callers fall back to the HTTP provider.
+    """
+    global _database
+    if _database is None:
+        try:
+            _database = GeoIPDatabase(settings.GEOIP_INDEX_PATH)
+        except (OSError, ValueError, struct.error, GeoIPIndexError):
+            logger.warning('No usable geoip index at %s, geolocating with ip-api.com instead',
+                           settings.GEOIP_INDEX_PATH, exc_info=True)
+            _database = _NO_INDEX
+    return None if _database is _NO_INDEX else _database
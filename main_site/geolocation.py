@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Marker stored in the shared tier for lookups that failed upstream.
+_NEGATIVE = '__geo_miss__'
+_MISSING = object()
+
+
+class GeoLocationCache:
+    """
+    In-process LRU cache for IP geolocation lookups.
+
+    Entries expire after ``ttl`` seconds, failed lookups are remembered for ``negative_ttl`` seconds so a bad
+    address does not hit the provider on every request. When ``shared_cache`` is the alias of a configured Django
+    cache, results are also written there so every worker process can reuse them.
+    """
+
+    def __init__(self, max_size=4096, ttl=86400, negative_ttl=300, shared_cache=None, key_prefix='geo',
+                 clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.shared_cache = caches[shared_cache] if shared_cache else None
+        self.key_prefix = key_prefix
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_size=settings.GEOLOCATION_CACHE_SIZE,
+            ttl=settings.GEOLOCATION_CACHE_TTL,
+            negative_ttl=settings.GEOLOCATION_NEGATIVE_CACHE_TTL,
+            shared_cache=settings.GEOLOCATION_SHARED_CACHE,
+        )
+
+    def _shared_key(self, ip_address):
+        return f'{self.key_prefix}:{ip_address}'
+
+    def _store_local(self, ip_address, data):
+        ttl = self.ttl if data is not None else self.negative_ttl
+        with self._lock:
+            self._entries[ip_address] = (self._clock() + ttl, data)
+            self._entries.move_to_end(ip_address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, ip_address):
+        """
+        Return ``(found, data)`` for an address. ``data`` is None for a cached failure.
+        """
+        with self._lock:
+            entry = self._entries.get(ip_address)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(ip_address)
+                    if data is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return True, data
+                del self._entries[ip_address]
+
+        if self.shared_cache is not None:
+            data = self.shared_cache.get(self._shared_key(ip_address), _MISSING)
+            if data is not _MISSING:
+                data = None if data == _NEGATIVE else data
+                self._store_local(ip_address, data)
+                with self._lock:
+                    self.shared_hits += 1
+                return True, data
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, ip_address, data):
+        """
+        Cache the lookup result for an address. Pass None to record a failed lookup.
+        """
+        self._store_local(ip_address, data)
+        if self.shared_cache is not None:
+            if data is None:
+                self.shared_cache.set(self._shared_key(ip_address), _NEGATIVE, self.negative_ttl)
+            else:
+                self.shared_cache.set(self._shared_key(ip_address), data, self.ttl)
+
+    def get_or_fetch(self, ip_address, fetch):
+        """
+        Return the cached data for an address, calling ``fetch(ip_address)`` and caching its result on a miss.
+        """
+        found, data = self.get(ip_address)
+        if found:
+            return data
+        data = fetch(ip_address)
+        self.set(ip_address, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (lookups - self.misses) / lookups if lookups else 0.0,
+            }
+
+
+_geo_cache = None
+
+
+def get_geo_cache():
+    """
+    Return the process wide geolocation cache, creating it from settings on first use.
+    """
+    global _geo_cache
+    if _geo_cache is None:
+        _geo_cache = GeoLocationCache.from_settings()
+    return _geo_cache
@@ -0,0 +1,67 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudinary.api
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDeletionError(Exception):
+    def __init__(self, deleted, public_ids, folders):
+        super().__init__(f'could not delete {len(public_ids)} images and {len(folders)} folders from Cloudinary')
+        self.deleted = deleted
+        self.public_ids = public_ids
+        self.folders = folders
+
+
+def _with_retry(func, *args, **kwargs):
+    attempts = settings.CLOUDINARY_DELETE_RETRIES + 1
+    for attempt in range(attempts):
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            logger.warning('Cloudinary call failed, retrying', exc_info=True)
+            time.sleep(settings.CLOUDINARY_DELETE_RETRY_DELAY * 2 ** attempt)
+
+
+def delete_cloudinary_images(public_ids, folders=(), api=None):
+    """
+    Delete images and then their now empty folders from Cloudinary, returns the deleted public ids.
+
+    Public ids go out in chunks of CLOUDINARY_DELETE_BATCH_SIZE, the most the Admin API accepts per call, on up
+    to CLOUDINARY_DELETE_WORKERS threads. Each call is retried CLOUDINARY_DELETE_RETRIES times with exponential
+    backoff. Folders are only removed when every image was deleted. Raises ImageDeletionError naming what is
+    left once the successful chunks are done, ``error.deleted`` holds the public ids that were deleted.
+    """
+    api = api or cloudinary.api
+    size = settings.CLOUDINARY_DELETE_BATCH_SIZE
+    chunks = [public_ids[start:start + size] for start in range(0, len(public_ids), size)]
+    if not chunks and not folders:
+        return []
+
+    deleted, failed, failed_folders = [], [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.CLOUDINARY_DELETE_WORKERS, len(chunks)))) as pool:
+        futures = [
+            (chunk, pool.submit(_with_retry, api.delete_resources, chunk, resource_type='image', type='upload'))
+            for chunk in chunks
+        ]
+        for chunk, future in futures:
+            if future.exception() is None:
+                deleted += chunk
+            else:
+                logger.error('Could not delete %d Cloudinary images', len(chunk), exc_info=future.exception())
+                failed += chunk
+        if not failed:
+            futures = [(folder, pool.submit(_with_retry, api.delete_folder, folder)) for folder in folders]
+            for folder, future in futures:
+                if future.exception() is not None:
+                    logger.error('Could not delete Cloudinary folder %s', folder, exc_info=future.exception())
+                    failed_folders.append(folder)
+
+    if failed or failed_folders:
+        raise ImageDeletionError(deleted, failed, failed_folders if not failed else list(folders))
+    return deleted
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import os
+
+from django import forms
+from django.conf import settings
+from django_countries import countries
+
+from .models import CompanyTrack
+
+IMPORT_FIELDS = ['company_name', 'position', 'country', 'city', 'url', 'note', 'applied_date']
+RESULT_FIELDS = ['line', 'tracker_id', 'tracker_url', 'company_name', 'position', 'error']
+
+
+class CompanyTrackImportForm(forms.ModelForm):
+    # same as CompanyTrackForm, the CountryField form field does not work with this Django version
+    country = forms.ChoiceField(choices=[(country.code, country.name) for country in countries])
+
+    class Meta:
+        model = CompanyTrack
+        fields = IMPORT_FIELDS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # rows without one are stamped with the import time by the model default
+        self.fields['applied_date'].required = False
+
+
+def read_rows(file, format=None):
+    """
+    Yield ``(line, row)`` pairs from a CSV or JSON lines file, reading one line at a time.
+
+    ``file`` may be opened in text or binary mode. The format is taken from the file name when not given.
+    """
+    if format is None:
+        name = getattr(file, 'name', '') or ''
+        format = 'jsonl' if os.path.splitext(name)[1].lower() in ('.jsonl', '.ndjson') else 'csv'
+    if 'b' in getattr(file, 'mode', 'b'):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+    if format == 'jsonl':
+        for line, text in enumerate(file, start=1):
+            if text.strip():
+                try:
+                    row = json.loads(text)
+                except ValueError as error:
+                    row = {'__error__': f'invalid JSON: {error}'}
+                yield line, row if isinstance(row, dict) else {'__error__': 'expected a JSON object'}
+    else:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def _country_code(value):
+    return countries.alpha2(value) or countries.by_name(value) or value
+
+
+class ResumeResolver:
+    """
+    Checks resume references against the storage of CompanyTrack.resume, remembering each answer.
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage or CompanyTrack._meta.get_field('resume').storage
+        self._exists = {}
+
+    def __call__(self, name):
+        if name not in self._exists:
+            self._exists[name] = self.storage.exists(name)
+        return self._exists[name]
+
+
+def tracker_url(tracker_id):
+    return settings.COMPANY_TRACK_URL_TEMPLATE.format(tracker_id=tracker_id)
+
+
+def import_company_tracks(rows, output, batch_size=None, resume=None, storage=None):
+    """
+    Validate ``(line, row)`` pairs as CompanyTrack entries and insert them with ``bulk_create`` in batches.
+
+    Only one batch is held in memory. A row may reference an already uploaded resume by its storage name in a
+    ``resume`` column, ``resume`` is used for rows without one. Referenced files are shared, not copied.
+
+    One CSV line per input row is written to the text stream ``output``, with the generated tracker id and URL or
+    the reason the row was skipped. Returns ``(created, skipped)``.
+    """
+    batch_size = batch_size or settings.COMPANY_TRACK_IMPORT_BATCH_SIZE
+    resume_exists = ResumeResolver(storage)
+    writer = csv.DictWriter(output, RESULT_FIELDS)
+    writer.writeheader()
+    created = skipped = 0
+    batch = []
+
+    def write_batch():
+        CompanyTrack.objects.bulk_create([company for _, company in batch])
+        for line, company in batch:
+            writer.writerow({
+                'line': line,
+                'tracker_id': company.tracker_id,
+                'tracker_url': tracker_url(company.tracker_id),
+                'company_name': company.company_name,
+                'position': company.position,
+            })
+        batch.clear()
+
+    for line, row in rows:
+        error = row.get('__error__')
+        data = {key: str(value).strip() for key, value in row.items() if key and value not in (None, '')}
+        if 'country' in data:
+            data['country'] = _country_code(data['country'])
+        resume_name = data.get('resume') or resume
+        form = CompanyTrackImportForm(data)
+        if error is None and not form.is_valid():
+            error = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+        if error is None and resume_name and not resume_exists(resume_name):
+            error = f'resume: {resume_name} does not exist'
+        if error is not None:
+            skipped += 1
+            writer.writerow({
+                'line': line,
+                'company_name': row.get('company_name', ''),
+                'position': row.get('position', ''),
+                'error': error,
+            })
+            continue
+
+        company = form.save(commit=False)
+        company.resume = resume_name or None
+        batch.append((line, company))
+        created += 1
+        if len(batch) >= batch_size:
+            write_batch()
+    if batch:
+        write_batch()
+    return created, skipped
@@ -0,0 +1,53 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import License
+
+# Stored for keys that do not exist so unknown keys are not looked up on every request.
+_NEGATIVE = '__no_license__'
+_MISSING = object()
+
+
+def _cache_key(license_key):
+    return f'license:{license_key}'
+
+
+def get_license_entitlement(license_key):
+    """
+    Return ``(active, api_names)`` for a license key, or None when the license does not exist.
+
+    Results are cached per key and dropped by the License/Api signal handlers when either side changes. Without
+    a shared cache the other workers only see the change once LICENSE_CACHE_TTL runs out, a few seconds by default.
+    """
+    try:
+        license_key = uuid.UUID(str(license_key))
+    except ValueError:
+        return None
+
+    key = _cache_key(license_key)
+    entry = cache.get(key, _MISSING)
+    if entry is _MISSING:
+        try:
+            license = License.objects.get(license_key=license_key)
+        except License.DoesNotExist:
+            cache.set(key, _NEGATIVE, settings.LICENSE_NEGATIVE_CACHE_TTL)
+            return None
+        entry = (license.active, frozenset(license.apis.values_list('name', flat=True)))
+        cache.set(key, entry, settings.LICENSE_CACHE_TTL)
+    return None if entry == _NEGATIVE else entry
+
+
+def invalidate_licenses(license_keys):
+    cache.delete_many([_cache_key(license_key) for license_key in license_keys])
+
+
+def invalidate_licenses_on_commit(license_keys):
+    """
+    Drop the cached entitlements of ``license_keys`` once the transaction commits, a request that reads the license
+    before then would cache the old entitlement again.
+    """
+    license_keys = list(license_keys)
+    transaction.on_commit(lambda: invalidate_licenses(license_keys))
@@ -0,0 +1,43 @@
+import timeit
+
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand
+
+from main_site.content import extract_image_urls
+
+
+def beautifulsoup_image_urls(html):
+    # the extraction Blog used before extract_image_urls
+    return [img['src'] for img in BeautifulSoup(html, 'html.parser').find_all('img') if 'src' in img.attrs]
+
+
+class Command(BaseCommand):
+    help = 'Compare image reference extraction of extract_image_urls and BeautifulSoup on a generated post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=500)
+        parser.add_argument('--paragraphs', type=int, default=2000)
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, *args, **options):
+        paragraph = '<p>Lorem ipsum <strong>dolor</strong> sit amet, <a href="#">consectetur</a> adipiscing.</p>'
+        every = max(1, options['paragraphs'] // max(1, options['images']))
+        html = ''.join(
+            paragraph + (f'<figure class="image"><img src="https://res.cloudinary.com/demo/blog/1/{index}.png">'
+                         f'</figure>' if index % every == 0 and index // every < options['images'] else '')
+            for index in range(options['paragraphs'])
+        )
+        if extract_image_urls(html) != beautifulsoup_image_urls(html):
+            raise AssertionError('extractors disagree')
+
+        iterations = options['iterations']
+        self.stdout.write(f'{len(html) / 1024:.0f} KiB, {len(extract_image_urls(html))} images')
+        results = {
+            'BeautifulSoup': timeit.timeit(lambda: beautifulsoup_image_urls(html), number=iterations),
+            'extract_image_urls': timeit.timeit(lambda: extract_image_urls(html), number=iterations),
+        }
+        for name, seconds in results.items():
+            self.stdout.write(f'{name:<20} {seconds / iterations * 1000:8.2f} ms/post')
+        self.stdout.write(self.style.SUCCESS(
+            f'{results["BeautifulSoup"] / results["extract_image_urls"]:.1f}x faster'
+        ))
@@ -0,0 +1,33 @@
+import timeit
+
+from django.core import serializers
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main_site.models import CompanyTrack
+from main_site.serializers import company_track_json
+
+
+class Command(BaseCommand):
+    help = 'Compare the job tracking serializer with django.core.serializers on an unsaved CompanyTrack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        company = CompanyTrack(
+            company_name='Example Corp', position='Backend Engineer', country='IN', city='Hyderabad',
+            url='https://example.com/jobs/1', note='Referred by a friend', applied_date=timezone.now(),
+            resume='resumes/resume.pdf',
+        )
+        iterations = options['iterations']
+        results = {
+            'django.core.serializers': timeit.timeit(lambda: serializers.serialize('json', [company]),
+                                                     number=iterations),
+            'company_track_json': timeit.timeit(lambda: company_track_json(company), number=iterations),
+        }
+        for name, seconds in results.items():
+            self.stdout.write(f'{name:<26} {seconds / iterations * 1e6:8.2f} us/call')
+        self.stdout.write(self.style.SUCCESS(
+            f'{results["django.core.serializers"] / results["company_track_json"]:.1f}x faster'
+        ))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main_site.geoip import build_index
+
+
+class Command(BaseCommand):
+    help = 'Build the binary geoip range index used by the offline geolocation backend from an IP range CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='CSV with network or start_ip/end_ip columns and country, city, zip')
+        parser.add_argument('--output', default=None, help='Index file to write, defaults to GEOIP_INDEX_PATH')
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.GEOIP_INDEX_PATH
+        count = build_index(options['csv_path'], output)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} ranges to {output}'))
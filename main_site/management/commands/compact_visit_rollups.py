@@ -0,0 +1,18 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main_site.analytics import compact_hourly_rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold hourly visit rollups older than the given number of days into daily rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=2, help='Days of hourly rollups to keep')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - datetime.timedelta(days=options['keep_days'])
+        removed = compact_hourly_rollups(before)
+        self.stdout.write(self.style.SUCCESS(f'Compacted {removed} hourly rollups'))
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from main_site.imports import import_company_tracks, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import CompanyTrack entries from a CSV or JSON lines file and write their tracker URLs as CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON lines file to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--resume', help='Storage name of an uploaded resume for rows without a resume column')
+        parser.add_argument('--batch-size', type=int, help='Rows per bulk insert')
+        parser.add_argument('--output', default='-', help='Where to write the results CSV, - for stdout')
+
+    def handle(self, *args, **options):
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='',
+                                                                  encoding='utf-8')
+        try:
+            with open(options['path'], 'rb') as source:
+                created, skipped = import_company_tracks(
+                    read_rows(source, options['format']), output,
+                    batch_size=options['batch_size'], resume=options['resume'],
+                )
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f'Imported {created} applications, skipped {skipped}'))
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main_site.enrichment import resolve_pending_visits
+from main_site.visits import get_visit_buffer
+
+
+class Command(BaseCommand):
+    help = 'Geolocate visits recorded with GEOLOCATION_DEFERRED and add them to the visit counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling for new visits')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+        parser.add_argument('--batch-size', type=int, default=settings.GEOLOCATION_WORKER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                resolved = resolve_pending_visits(options['batch_size'])
+                if resolved:
+                    self.stdout.write(f'Resolved {resolved} visits')
+                elif not options['loop']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        finally:
+            get_visit_buffer().flush()
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main_site.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send the pending emails of the email outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling for new emails')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent = drain_outbox()
+            if sent:
+                self.stdout.write(f'Sent {sent} emails')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
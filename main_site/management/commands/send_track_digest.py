@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main_site.alerts import send_track_digest
+
+
+class Command(BaseCommand):
+    help = 'Email one digest of the CompanyTrack opens that no alert has covered yet.'
+
+    def handle(self, *args, **options):
+        opens = send_track_digest()
+        self.stdout.write(f'Sent a digest of {opens} opens' if opens else 'No new opens')
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:13
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0013_mainsitecontact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('created_date', models.DateTimeField(default=datetime.datetime.now)),
+                ('title', models.CharField(max_length=130)),
+                ('slug', models.SlugField(max_length=150, unique=True)),
+                ('active', models.BooleanField(default=True)),
+                ('approved', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BlogImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_id', models.CharField(max_length=150)),
+                ('url', models.URLField(default='')),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_site.blog')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0014_blog_blogimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], default='hour', max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('country', models.CharField(blank=True, max_length=50)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('visits', models.IntegerField(default=0)),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='main_site.website')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='visitrollup',
+            constraint=models.UniqueConstraint(fields=('website', 'granularity', 'bucket', 'country', 'city'), name='unique_visit_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def merge_locations(apps, schema_editor):
+    """
+    Give every location the website it was linked to and merge duplicate rows, summing their visits.
+    """
+    Website = apps.get_model('main_site', 'Website')
+    Location = apps.get_model('main_site', 'Location')
+    links = Website.locations.through.objects.select_related('location').order_by('location_id')
+
+    kept = {}
+    assigned = set()
+    for link in links:
+        location = link.location
+        key = (link.website_id, location.country, location.city, location.zip, location.ip_address)
+        keeper = kept.get(key)
+        if keeper is not None:
+            keeper.total_visits += location.total_visits
+            keeper.save(update_fields=['total_visits'])
+        elif location.pk not in assigned:
+            location.website_id = link.website_id
+            location.save(update_fields=['website'])
+            assigned.add(location.pk)
+            kept[key] = location
+        else:
+            # location shared by several websites, each gets its own row
+            kept[key] = Location.objects.create(
+                website_id=link.website_id,
+                country=location.country,
+                city=location.city,
+                zip=location.zip,
+                ip_address=location.ip_address,
+                total_visits=location.total_visits,
+            )
+
+    Location.objects.exclude(pk__in=[location.pk for location in kept.values()]).delete()
+
+
+def link_locations(apps, schema_editor):
+    Location = apps.get_model('main_site', 'Location')
+    Through = apps.get_model('main_site', 'Website').locations.through
+    Through.objects.bulk_create([
+        Through(website_id=website_id, location_id=location_id)
+        for location_id, website_id in Location.objects.values_list('pk', 'website_id')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0015_visitrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='website',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main_site.website'),
+        ),
+        migrations.RunPython(merge_locations, link_locations),
+        migrations.RemoveField(
+            model_name='website',
+            name='locations',
+        ),
+        migrations.AlterField(
+            model_name='location',
+            name='website',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='main_site.website'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('website', 'country', 'city', 'zip', 'ip_address'), name='unique_website_location'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0016_location_website'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueVisitorSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sketch', models.BinaryField()),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitor_sketches', to='main_site.website')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='uniquevisitorsketch',
+            constraint=models.UniqueConstraint(fields=('website', 'day'), name='unique_visitor_sketch_day'),
+        ),
+    ]
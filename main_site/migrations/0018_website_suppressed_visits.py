@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0017_uniquevisitorsketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='website',
+            name='bot_visits',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='website',
+            name='duplicate_visits',
+            field=models.IntegerField(default=0),
+        ),
+    ]
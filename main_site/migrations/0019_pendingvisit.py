@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0018_website_suppressed_visits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingVisit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ip_address', models.CharField(max_length=100)),
+                ('visited_at', models.DateTimeField()),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_site.website')),
+            ],
+        ),
+    ]
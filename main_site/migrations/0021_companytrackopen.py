@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0020_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyTrackOpen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opened_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notified', models.BooleanField(default=False)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opens', to='main_site.companytrack')),
+            ],
+        ),
+    ]
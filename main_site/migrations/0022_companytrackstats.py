@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def backfill_stats(apps, schema_editor):
+    CompanyTrackOpen = apps.get_model('main_site', 'CompanyTrackOpen')
+    CompanyTrackStats = apps.get_model('main_site', 'CompanyTrackStats')
+    rows = (
+        CompanyTrackOpen.objects.values('company', 'company__applied_date')
+        .annotate(first_opened=Min('opened_at'), last_opened=Max('opened_at'), open_count=Count('pk'))
+        .order_by()
+    )
+    CompanyTrackStats.objects.bulk_create([
+        CompanyTrackStats(
+            company_id=row['company'],
+            first_opened=row['first_opened'],
+            last_opened=row['last_opened'],
+            open_count=row['open_count'],
+            time_to_first_open=row['first_opened'] - row['company__applied_date'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0021_companytrackopen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyTrackStats',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='open_stats', serialize=False, to='main_site.companytrack')),
+                ('first_opened', models.DateTimeField()),
+                ('last_opened', models.DateTimeField()),
+                ('open_count', models.IntegerField(default=0)),
+                ('time_to_first_open', models.DurationField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='companytrackopen',
+            index=models.Index(fields=['company', 'opened_at'], name='company_open_by_company'),
+        ),
+        migrations.AddIndex(
+            model_name='companytrackopen',
+            index=models.Index(fields=['opened_at'], name='company_open_by_time'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0022_companytrackstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(condition=models.Q(('active', True), ('approved', True)), fields=['-created_date', '-id'], name='blog_published_recent'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:32
+
+import re
+from html.parser import HTMLParser
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+# A frozen copy of main_site.content.html_to_text as of this migration, so later changes to the app code cannot
+# change what it does.
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure', 'footer',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th',
+    'tr', 'ul',
+}
+SKIPPED_TAGS = {'script', 'style', 'template'}
+WHITESPACE = re.compile(r'\s+')
+
+
+class TextParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    parser = TextParser()
+    parser.feed(html or '')
+    parser.close()
+    lines = (WHITESPACE.sub(' ', line).strip() for line in ''.join(parser.parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def backfill_search(apps, schema_editor):
+    Blog = apps.get_model('main_site', 'Blog')
+    for blog in Blog.objects.only('pk', 'content').iterator():
+        Blog.objects.filter(pk=blog.pk).update(plain_text=html_to_text(blog.content))
+    if schema_editor.connection.vendor == 'postgresql':
+        Blog.objects.update(search_vector=SearchVector('title', weight='A', config='english') +
+                            SearchVector('plain_text', weight='B', config='english'))
+
+
+def create_search_index(apps, schema_editor):
+    # GIN is PostgreSQL only, other databases search with main_site.search.BlogSearchIndex
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS blog_search_vector ON main_site_blog USING gin (search_vector)'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS blog_search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0023_blog_published_recent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='plain_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_search, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,158 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:34
+
+import math
+import re
+from html.parser import HTMLParser
+
+from django.db import migrations, models
+from django.utils.html import escape
+from django.utils.text import slugify
+
+DERIVED_FIELDS = ['content', 'plain_text', 'excerpt', 'word_count', 'reading_time', 'toc']
+
+# A frozen copy of main_site.content.analyze_content and its default settings as of this migration, so later
+# changes to the app code cannot change what it does.
+EXCERPT_LENGTH = 300
+WORDS_PER_MINUTE = 200
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure', 'footer',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th',
+    'tr', 'ul',
+}
+SKIPPED_TAGS = {'script', 'style', 'template'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+WHITESPACE = re.compile(r'\s+')
+EMPTY_ID = re.compile(r'''\s+id(?:\s*=\s*(?:""|''))?(?=[\s/>])''', re.IGNORECASE)
+
+
+class ContentParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.headings = []
+        self._skipping = 0
+        self._heading = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+        if tag in HEADING_TAGS:
+            self._heading = (int(tag[1]), dict(attrs).get('id'), [], self.getpos(), self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+        if tag in HEADING_TAGS and self._heading is not None:
+            level, anchor, parts, position, start_tag = self._heading
+            text = WHITESPACE.sub(' ', ''.join(parts)).strip()
+            if text:
+                self.headings.append((level, anchor, text, position, start_tag))
+            self._heading = None
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+            if self._heading is not None:
+                self._heading[2].append(data)
+
+
+def excerpt(text, length):
+    text = WHITESPACE.sub(' ', text).strip()
+    if len(text) <= length:
+        return text
+    cut = text.rfind(' ', 0, length)
+    return text[:cut if cut > 0 else length].rstrip(' ,.;:') + '…'
+
+
+def add_heading_ids(html, anchors):
+    if not anchors:
+        return html
+    line_starts = [0] + [match.end() for match in re.finditer('\n', html)]
+    parts, last = [], 0
+    for (line, column), (start_tag, anchor) in sorted(anchors.items()):
+        offset = line_starts[line - 1] + column
+        tag = EMPTY_ID.sub('', start_tag)
+        parts += [html[last:offset], tag[:3], f' id="{escape(anchor)}"', tag[3:]]
+        last = offset + len(start_tag)
+    parts.append(html[last:])
+    return ''.join(parts)
+
+
+def analyze_content(html):
+    html = html or ''
+    parser = ContentParser()
+    parser.feed(html)
+    parser.close()
+    lines = (WHITESPACE.sub(' ', line).strip() for line in ''.join(parser.parts).split('\n'))
+    plain_text = '\n'.join(line for line in lines if line)
+    word_count = len(plain_text.split())
+    toc = []
+    used = {anchor for _, anchor, _, _, _ in parser.headings if anchor}
+    added = {}
+    for level, anchor, text, position, start_tag in parser.headings:
+        if not anchor:
+            base = slugify(text) or 'section'
+            anchor, number = base, 1
+            while anchor in used:
+                number += 1
+                anchor = f'{base}-{number}'
+            used.add(anchor)
+            added[position] = (start_tag, anchor)
+        toc.append({'level': level, 'id': anchor, 'text': text})
+    return {
+        'content': add_heading_ids(html, added),
+        'plain_text': plain_text,
+        'excerpt': excerpt(plain_text, EXCERPT_LENGTH),
+        'word_count': word_count,
+        'reading_time': math.ceil(word_count / WORDS_PER_MINUTE),
+        'toc': toc,
+    }
+
+
+def backfill_derived_fields(apps, schema_editor):
+    Blog = apps.get_model('main_site', 'Blog')
+    blogs = []
+    for blog in Blog.objects.only('pk', 'content').iterator():
+        derived = analyze_content(blog.content)
+        for field in DERIVED_FIELDS:
+            setattr(blog, field, derived[field])
+        blogs.append(blog)
+        if len(blogs) == 100:
+            Blog.objects.bulk_update(blogs, DERIVED_FIELDS)
+            blogs = []
+    Blog.objects.bulk_update(blogs, DERIVED_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_site', '0024_blog_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_derived_fields, migrations.RunPython.noop),
+    ]
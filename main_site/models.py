@@ -2,11 +2,15 @@ import datetime
 import uuid
 from typing import List
 
-from bs4 import BeautifulSoup
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models
+from django.utils import timezone
 from django_countries.fields import CountryField
 
-import cloudinary.api
+from .content import analyze_content, extract_image_urls
+from .file_cache import invalidate_cached_file
+from .images import ImageDeletionError, delete_cloudinary_images
 
 
 class Website(models.Model):
@@ -15,23 +19,92 @@ class Website(models.Model):
     url = models.URLField()
     last_visit = models.DateTimeField(auto_now=True)
     total_visits = models.IntegerField(default=0)
-    locations = models.ManyToManyField('Location', blank=True)
+    # beacons that were not counted in total_visits
+    duplicate_visits = models.IntegerField(default=0)
+    bot_visits = models.IntegerField(default=0)
 
     def __str__(self):
         return self.name
 
 
 class Location(models.Model):
+    website = models.ForeignKey('Website', on_delete=models.CASCADE, related_name='locations')
     country = models.CharField(max_length=50)
     city = models.CharField(max_length=100)
     zip = models.CharField(max_length=100)
     ip_address = models.CharField(max_length=100)
     total_visits = models.IntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['website', 'country', 'city', 'zip', 'ip_address'],
+                name='unique_website_location',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.city}, {self.country}"
 
 
+class PendingVisit(models.Model):
+    """
+    A visit recorded before its IP address was geolocated, see the resolve_pending_visits command.
+    """
+    website = models.ForeignKey('Website', on_delete=models.CASCADE)
+    ip_address = models.CharField(max_length=100)
+    visited_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.website} - {self.ip_address}"
+
+
+class VisitRollup(models.Model):
+    """
+    Visits of a website per time bucket and location.
+
+    Rows are written as hourly buckets and folded into daily buckets by the compact_visit_rollups command.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    website = models.ForeignKey('Website', on_delete=models.CASCADE, related_name='rollups')
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES, default=HOUR)
+    bucket = models.DateTimeField()
+    country = models.CharField(max_length=50, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    visits = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['website', 'granularity', 'bucket', 'country', 'city'],
+                name='unique_visit_rollup_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.website} - {self.bucket} - {self.city}, {self.country}"
+
+
+class UniqueVisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of the visitors of a website on one day, see main_site.hyperloglog.
+    """
+    website = models.ForeignKey('Website', on_delete=models.CASCADE, related_name='visitor_sketches')
+    day = models.DateField()
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['website', 'day'], name='unique_visitor_sketch_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.website} - {self.day}"
+
+
 class CompanyTrack(models.Model):
     tracker_id = models.UUIDField(primary_key=True, auto_created=True, editable=False, default=uuid.uuid4)
 
@@ -46,15 +119,73 @@ class CompanyTrack(models.Model):
     note = models.TextField(blank=True)
     resume = models.FileField(upload_to='resumes/', blank=True, null=True)
 
+    def delete_resume(self):
+        """
+        Delete the resume file unless another tracker or Resume still references it, imports share files.
+        """
+        if not self.resume:
+            return
+        name = self.resume.name
+        if CompanyTrack.objects.filter(resume=name).exclude(pk=self.pk).exists() or \
+                Resume.objects.filter(file=name).exists():
+            return
+        invalidate_cached_file(name)
+        self.resume.delete(save=False)
+
     def delete(self, *args, **kwargs):
-        if self.resume:
-            self.resume.delete()
+        self.delete_resume()
         super().delete(*args, **kwargs)
 
+    @staticmethod
+    def delete_unreferenced_resumes(resumes):
+        """
+        Delete the files of ``resumes`` that no CompanyTrack or Resume references any more, for after a bulk delete.
+        """
+        files = {file.name: file for file in resumes if file}
+        referenced = set(CompanyTrack.objects.filter(resume__in=files).values_list('resume', flat=True))
+        referenced.update(Resume.objects.filter(file__in=files).values_list('file', flat=True))
+        for name, file in files.items():
+            if name not in referenced:
+                invalidate_cached_file(name)
+                file.delete(save=False)
+
     def __str__(self):
         return f"{self.company_name} - {self.position}"
 
 
+class CompanyTrackOpen(models.Model):
+    """
+    One opening of a CompanyTrack link. ``notified`` is set once an alert email covers the open.
+    """
+    company = models.ForeignKey('CompanyTrack', on_delete=models.CASCADE, related_name='opens')
+    opened_at = models.DateTimeField(default=timezone.now)
+    notified = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'opened_at'], name='company_open_by_company'),
+            models.Index(fields=['opened_at'], name='company_open_by_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.company} - {self.opened_at}"
+
+
+class CompanyTrackStats(models.Model):
+    """
+    Open aggregates of one CompanyTrack, kept up to date as opens are written.
+    """
+    company = models.OneToOneField('CompanyTrack', on_delete=models.CASCADE, primary_key=True,
+                                   related_name='open_stats')
+    first_opened = models.DateTimeField()
+    last_opened = models.DateTimeField()
+    open_count = models.IntegerField(default=0)
+    time_to_first_open = models.DurationField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.company} - {self.open_count}"
+
+
 class License(models.Model):
     license_key = models.UUIDField(primary_key=True, auto_created=True, editable=False, default=uuid.uuid4)
     name = models.CharField(max_length=100)
@@ -91,6 +222,40 @@ class MainSiteContact(models.Model):
         return self.name
 
 
+class OutboxEmail(models.Model):
+    """
+    A rendered email waiting to be sent by the outbox sender, see main_site.outbox.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (DEAD, 'Dead')]
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=254)
+    recipient = models.CharField(max_length=254)
+    html_message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    sent_date = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_email_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} - {self.recipient}"
+
+
+DERIVED_CONTENT_FIELDS = ['plain_text', 'excerpt', 'word_count', 'reading_time', 'toc']
+BLOG_SEARCH_VECTOR = SearchVector('title', weight='A', config='english') + \
+    SearchVector('plain_text', weight='B', config='english')
+
+
 class Blog(models.Model):
     content = models.TextField()
     created_date = models.DateTimeField(default=datetime.datetime.now)
@@ -98,55 +263,89 @@ class Blog(models.Model):
     slug = models.SlugField(max_length=150, unique=True)  # slug eg:- this-is-a-blog-post
     active = models.BooleanField(default=True)
     approved = models.BooleanField(default=False)
+    # derived from content on save by main_site.content.analyze_content, so readers never parse the HTML, which
+    # also adds the toc ids to the headings of content
+    plain_text = models.TextField(blank=True, default='', editable=False)
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False)  # minutes
+    toc = models.JSONField(default=list, blank=True, editable=False)
+    # title and plain_text as a weighted tsvector, only filled on PostgreSQL, GIN indexed by migration 0024
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the published posts, newest first
+            models.Index(
+                fields=['-created_date', '-id'],
+                condition=models.Q(approved=True, active=True),
+                name='blog_published_recent',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        derived = analyze_content(self.content, settings.BLOG_EXCERPT_LENGTH, settings.BLOG_WORDS_PER_MINUTE)
+        content = derived.pop('content')
+        for field, value in derived.items():
+            setattr(self, field, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(DERIVED_CONTENT_FIELDS)
+            if content != self.content:
+                kwargs['update_fields'].add('content')
+        self.content = content
+        super().save(*args, **kwargs)
+        if connection.vendor == 'postgresql':
+            Blog.objects.filter(pk=self.pk).update(search_vector=BLOG_SEARCH_VECTOR)
+
     def delete(self, using=None, keep_parents=False):
         self.delete_images(delete_folder=True)
         super().delete(using, keep_parents)
 
+    @staticmethod
+    def _delete_cloudinary_images(public_ids, folders=()):
+        """
+        Delete images from Cloudinary and the BlogImage rows of those that are gone, in one query.
+        """
+        try:
+            deleted = delete_cloudinary_images(public_ids, folders)
+        except ImageDeletionError as error:
+            BlogImage.objects.filter(public_id__in=error.deleted).delete()
+            raise
+        BlogImage.objects.filter(public_id__in=deleted).delete()
+
+    @classmethod
+    def delete_images_of(cls, blogs, delete_folder: bool = True):
+        """
+        Delete the images of several blogs with as few Cloudinary calls as possible.
+        """
+        public_ids, folders = [], set()
+        for blog_id, public_id in BlogImage.objects.filter(blog__in=blogs).values_list('blog_id', 'public_id'):
+            public_ids.append(public_id)
+            folders.add(f'blog/{blog_id}')
+        cls._delete_cloudinary_images(public_ids, sorted(folders) if delete_folder else ())
+
     def delete_images(self, public_ids=None, delete_folder: bool = False):
 
         if public_ids is None:
             public_ids = BlogImage.objects.filter(blog=self).values_list('public_id', flat=True)
             public_ids = list(public_ids)
         if public_ids:
-            cloudinary.api.delete_resources(public_ids, resource_type='image', type='upload')
-
-        if public_ids and delete_folder:
-            cloudinary.api.delete_folder(f'blog/{self.id}')
-            BlogImage.objects.filter(public_id__in=public_ids).delete()
-
-    def _get_image_tags(self):
-        soup = BeautifulSoup(self.content, 'html.parser')
-        img_tags = soup.find_all('img')
-        return img_tags
+            self._delete_cloudinary_images(public_ids, [f'blog/{self.id}'] if delete_folder else ())
 
     def _get_image_urls(self):
-        img_tags = self._get_image_tags()
-        urls = [img['src'] for img in img_tags if 'src' in img.attrs]
-        return urls
-
-    def _get_public_ids(self):
-        urls = self._get_image_urls()
-        # public ids look like "blog/{blog_id}/{image_name}" we need include blog/{blog_id}/image name
-
-        public_ids = BlogImage.objects.filter(url__in=urls).values_list('public_id', flat=True)
-
-        return public_ids
+        return extract_image_urls(self.content)
 
-    def _unused_images(self):
-        present = self._get_public_ids()
-        # find unused images by comparing original and public_ids from BlogImage
-        all_blog_images = BlogImage.objects.filter(blog=self)
-        diff = set(all_blog_images) - set(present)
-        return list(diff)
+    def _unused_public_ids(self):
+        # images uploaded for this post that the current content no longer references
+        return BlogImage.objects.filter(blog=self).exclude(url__in=self._get_image_urls()) \
+            .values_list('public_id', flat=True)
 
     def delete_unused_images(self):
-        unused_images = self._unused_images()
-        public_ids = [image.public_id for image in unused_images]
-        self.delete_images(public_ids)
+        self.delete_images(list(self._unused_public_ids()))
 
 
 class BlogImage(models.Model):
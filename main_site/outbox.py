@@ -0,0 +1,119 @@
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .background import PeriodicTask
+from .models import OutboxEmail
+
+
+def enqueue_email(subject, from_email, recipient, html_message):
+    """
+    Record a rendered email in the outbox, it is sent by the outbox sender after the transaction commits.
+    """
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        from_email=from_email,
+        recipient=recipient,
+        html_message=html_message,
+    )
+    start_outbox_sender()
+    return email
+
+
+def _backoff(attempts):
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return datetime.timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_MAX_RETRY_DELAY))
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body='',
+        from_email=email.from_email,
+        to=[email.recipient],
+        connection=connection,
+    )
+    message.attach_alternative(email.html_message, 'text/html')
+    return message
+
+
+def _failed(email, error, now):
+    email.attempts += 1
+    email.last_error = repr(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboxEmail.DEAD
+    else:
+        email.next_attempt_at = now + _backoff(email.attempts)
+
+
+def _claim(batch_size, now):
+    """
+    Take up to ``batch_size`` due emails for EMAIL_OUTBOX_CLAIM_TIMEOUT seconds and commit, so no row stays
+    locked while they are sent. Emails of a sender that died are due again once the claim runs out.
+    """
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        claimed_until = now + datetime.timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=claimed_until)
+    return emails
+
+
+def drain_outbox(batch_size=None):
+    """
+    Send the due outbox emails over a single SMTP connection, ``batch_size`` at a time.
+
+    Each batch is claimed in a short transaction and sent after it commits. Failed emails are retried with
+    exponential backoff and marked dead after EMAIL_OUTBOX_MAX_ATTEMPTS. Returns the number of emails sent.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    connection = None
+    sent = 0
+    try:
+        while True:
+            now = timezone.now()
+            emails = _claim(batch_size, now)
+            if not emails:
+                return sent
+            for email in emails:
+                try:
+                    if connection is None:
+                        connection = get_connection(fail_silently=False)
+                        connection.open()
+                    connection.send_messages([_message(email, connection)])
+                except Exception as error:
+                    _failed(email, error, now)
+                    # start over with a fresh connection, the failure may have broken it
+                    if connection is not None:
+                        connection.close()
+                        connection = None
+                else:
+                    email.status = OutboxEmail.SENT
+                    email.sent_date = timezone.now()
+                    sent += 1
+            OutboxEmail.objects.bulk_update(
+                emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_date'],
+            )
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+_sender = None
+
+
+def start_outbox_sender():
+    """
+    Start the in-process thread draining the outbox, when EMAIL_OUTBOX_INTERVAL is set.
+    """
+    global _sender
+    if _sender is None and settings.EMAIL_OUTBOX_INTERVAL > 0:
+        _sender = PeriodicTask(settings.EMAIL_OUTBOX_INTERVAL, drain_outbox, name='email-outbox')
+    if _sender is not None:
+        _sender.start()
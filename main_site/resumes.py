@@ -0,0 +1,63 @@
+import hashlib
+import mimetypes
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .file_delivery import open_stored_file
+from .models import Resume
+
+# Bump when the layout of the record changes so workers never read a record they do not understand.
+RECORD_VERSION = 1
+ACTIVE_RESUME_KEY = f'active-resume:v{RECORD_VERSION}'
+GENERATION_KEY = 'active-resume:generation'
+_NO_RESUME = '__no_resume__'
+
+
+def describe_resume(resume, generation=0):
+    """
+    Build the active resume record: storage name, size, content type and SHA-256 of the content.
+    """
+    storage, name = resume.file.storage, resume.file.name
+    stored = open_stored_file(storage, name)
+    checksum = hashlib.sha256()
+    for chunk in stored.chunks(0, stored.size - 1, settings.RESUME_CHUNK_SIZE):
+        checksum.update(chunk)
+    content_type, _ = mimetypes.guess_type(name)
+    return {
+        'version': RECORD_VERSION,
+        'generation': generation,
+        'pk': resume.pk,
+        'name': name,
+        'size': stored.size,
+        'content_type': content_type or 'application/octet-stream',
+        'checksum': checksum.hexdigest(),
+        'last_modified': stored.last_modified.timestamp(),
+    }
+
+
+def refresh_active_resume():
+    """
+    Rebuild the cached active resume record from the first Resume by pk and return it, None without one.
+
+    Every refresh takes a new generation, a refresh that finishes after a newer one started does not overwrite its
+    record. The record expires after RESUME_RECORD_TTL seconds so workers on a per process cache, which the signal
+    handlers do not reach, pick up a new resume too.
+    """
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    generation = cache.incr(GENERATION_KEY)
+    resume = Resume.objects.exclude(file='').exclude(file=None).order_by('pk').first()
+    record = describe_resume(resume, generation) if resume is not None else None
+    if cache.get(GENERATION_KEY) == generation:
+        cache.set(ACTIVE_RESUME_KEY, record if record is not None else _NO_RESUME, settings.RESUME_RECORD_TTL)
+    return record
+
+
+def get_active_resume():
+    """
+    Return the cached active resume record, building it on a cold cache.
+    """
+    record = cache.get(ACTIVE_RESUME_KEY)
+    if record is None:
+        return refresh_active_resume()
+    return None if record == _NO_RESUME else record
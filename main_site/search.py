@@ -0,0 +1,168 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from django.utils.html import escape
+
+from .blog import published_blogs
+from .blog_cache import blog_list_version
+
+TOKEN = re.compile(r'\w+')
+TITLE_WEIGHT = 3
+SNIPPET_CHARS = 200
+# Shorter terms only match whole words, a one letter prefix would match most of the vocabulary
+MIN_PREFIX_LENGTH = 3
+# Highlight delimiters that cannot appear in text, swapped for <mark> after escaping
+START_MARK, STOP_MARK = '\x02', '\x03'
+RESULT_FIELDS = ['id', 'title', 'slug', 'created_date']
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def _highlight(text):
+    return escape(text).replace(START_MARK, '<mark>').replace(STOP_MARK, '</mark>')
+
+
+def _snippet(text, terms):
+    """
+    Return about SNIPPET_CHARS of ``text`` around the first match of any prefix in ``terms``, matches marked.
+    """
+    pattern = re.compile(r'\b(?:%s)\w*' % '|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - SNIPPET_CHARS // 4) if match else 0
+    if start:
+        # start and end on word boundaries
+        space = text.find(' ', start, match.start())
+        start = space + 1 if space != -1 else start
+    end = start + SNIPPET_CHARS
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+    window = pattern.sub(lambda found: START_MARK + found.group() + STOP_MARK, text[start:end])
+    return ('… ' if start else '') + _highlight(window) + (' …' if end < len(text) else '')
+
+
+class BlogSearchIndex:
+    """
+    In-memory inverted index of the published posts, for databases without full text search.
+
+    Every token of a title or plain text maps to the posts containing it and a weight, title tokens count
+    TITLE_WEIGHT times. Query terms of at least MIN_PREFIX_LENGTH characters are matched as prefixes by bisecting
+    the sorted vocabulary, posts must match every term and are ranked by the sum of weight times inverse document
+    frequency.
+    """
+
+    def __init__(self, documents):
+        self.documents = {}
+        self.postings = defaultdict(dict)
+        for document in documents:
+            pk = document['id']
+            self.documents[pk] = document
+            weights = Counter(tokenize(document['plain_text']))
+            for token in tokenize(document['title']):
+                weights[token] += TITLE_WEIGHT
+            for token, weight in weights.items():
+                self.postings[token][pk] = weight
+        self.vocabulary = sorted(self.postings)
+
+    def _expand(self, prefix):
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return [prefix] if prefix in self.postings else []
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        return self.vocabulary[start:end]
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            matches = {}
+            for token in self._expand(term):
+                postings = self.postings[token]
+                idf = math.log(1 + len(self.documents) / len(postings))
+                for pk, weight in postings.items():
+                    matches[pk] = max(matches.get(pk, 0), weight * idf)
+            scores = matches if scores is None else {pk: scores[pk] + score for pk, score in matches.items()
+                                                     if pk in scores}
+            if not scores:
+                return []
+
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: (
+            item[1], self.documents[item[0]]['created_date'], item[0],
+        ))
+        return [{
+            **{field: self.documents[pk][field] for field in RESULT_FIELDS},
+            'rank': round(score, 4),
+            'snippet': _snippet(self.documents[pk]['plain_text'], terms),
+        } for pk, score in ranked]
+
+
+_index = None
+_index_version = None
+_index_built = 0
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """
+    Return the process wide BlogSearchIndex, rebuilt whenever a post changed since it was built.
+
+    Changes made by other workers are only seen through a shared cache, the index is also rebuilt once it is
+    BLOG_CACHE_TTL seconds old.
+    """
+    global _index, _index_version, _index_built
+    version = blog_list_version()
+    with _index_lock:
+        expired = time.monotonic() - _index_built >= settings.BLOG_CACHE_TTL
+        if _index is None or _index_version != version or expired:
+            _index = BlogSearchIndex(published_blogs().values(*RESULT_FIELDS, 'plain_text').iterator())
+            _index_version = version
+            _index_built = time.monotonic()
+        return _index
+
+
+def _postgres_search(query, limit):
+    terms = tokenize(query)
+    if not terms:
+        return []
+    search_query = SearchQuery(
+        ' & '.join(f'{term}:*' if len(term) >= MIN_PREFIX_LENGTH else term for term in terms),
+        search_type='raw', config='english',
+    )
+    rows = (
+        published_blogs()
+        .filter(search_vector=search_query)
+        .annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+            snippet=SearchHeadline('plain_text', search_query, config='english', start_sel=START_MARK,
+                                   stop_sel=STOP_MARK, max_words=35, min_words=15),
+        )
+        .order_by('-rank', '-created_date', '-id')
+        .values(*RESULT_FIELDS, 'rank', 'snippet')[:limit]
+    )
+    return [{**row, 'rank': round(row['rank'], 4), 'snippet': _highlight(row['snippet'])} for row in rows]
+
+
+def search_blogs(query, limit=None):
+    """
+    Return the published posts matching every word of ``query`` as a prefix, best match first.
+
+    Results hold the post summary, a ``rank`` and an HTML ``snippet`` with the matches wrapped in ``<mark>``.
+    PostgreSQL searches the GIN indexed ``search_vector`` column, other databases use the in-memory index.
+    """
+    limit = min(limit or settings.BLOG_PAGE_SIZE, settings.BLOG_MAX_PAGE_SIZE)
+    if connection.vendor == 'postgresql':
+        return _postgres_search(query, limit)
+    return get_search_index().search(query, limit)
@@ -0,0 +1,41 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+COMPANY_TRACK_FIELDS = ('company_name', 'position', 'country', 'city', 'applied_date', 'url', 'note')
+
+_encode_datetime = DjangoJSONEncoder().default
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), check_circular=False).encode
+
+
+def company_track_json(company):
+    """
+    Serialize a CompanyTrack for the portfolio front end.
+
+    Keeps the ``[{"model", "pk", "fields"}]`` envelope and date format of ``serializers.serialize('json', ...)`` so
+    existing clients keep working, but only emits COMPANY_TRACK_FIELDS, leaving out the resume path and the open
+    state.
+    """
+    return _dumps([{
+        'model': 'main_site.companytrack',
+        'pk': str(company.tracker_id),
+        'fields': {
+            'company_name': company.company_name,
+            'position': company.position,
+            'country': company.country.code,
+            'city': company.city,
+            'applied_date': _encode_datetime(company.applied_date),
+            'url': company.url,
+            'note': company.note,
+        },
+    }])
+
+
+def body_etag(body):
+    """
+    Return a strong ETag for a response body.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
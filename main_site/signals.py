@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .blog_cache import invalidate_blog_on_commit
+from .licenses import invalidate_licenses_on_commit
+from .models import License, Api, Resume, Blog
+from .resumes import refresh_active_resume
+
+
+@receiver([post_save, post_delete], sender=License)
+def license_changed(sender, instance, **kwargs):
+    invalidate_licenses_on_commit([instance.license_key])
+
+
+@receiver(post_save, sender=Api)
+@receiver(pre_delete, sender=Api)
+def api_changed(sender, instance, **kwargs):
+    invalidate_licenses_on_commit(instance.license_set.values_list('license_key', flat=True))
+
+
+@receiver(m2m_changed, sender=License.apis.through)
+def license_apis_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_licenses_on_commit([instance.license_key])
+    elif pk_set:
+        invalidate_licenses_on_commit(pk_set)
+    else:
+        invalidate_licenses_on_commit(instance.license_set.values_list('license_key', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Resume)
+def resume_changed(sender, instance, **kwargs):
+    transaction.on_commit(refresh_active_resume)
+
+
+@receiver([post_save, post_delete], sender=Blog)
+def blog_changed(sender, instance, **kwargs):
+    invalidate_blog_on_commit(instance.slug)
@@ -1,7 +1,49 @@
-from django.test import TestCase, RequestFactory
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import InterfaceError, connection, transaction
+from django.http import FileResponse, HttpResponse
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main_site.alerts import send_track_digest
+from main_site.analytics import compact_hourly_rollups
+from main_site.background import PeriodicTask
+from main_site.beacons import RotatingBloomFilter, is_bot
+from main_site.blog import blog_archive_json
+from main_site.blog_cache import cached_blog_response
+from main_site.decorator import check_license
+from main_site.content import extract_image_urls
+from main_site.enrichment import resolve_pending_visits
+from main_site.file_cache import DiskFileCache
+from main_site.file_delivery import deliver_file
+from main_site.geoip import GeoIPDatabase, build_index, get_geoip_database
+from main_site.geolocation import GeoLocationCache, get_geo_cache
+from main_site.hyperloglog import HyperLogLog
+from main_site.images import ImageDeletionError, delete_cloudinary_images
+from main_site.imports import import_company_tracks, read_rows
+from main_site.outbox import drain_outbox, enqueue_email
+from main_site.search import search_blogs
+from main_site.tracking import OpenEventBuffer, company_open_stats
+from main_site.utils import get_ip_address_data, get_ip_address_data_many
 from main_site.views import main_resume
-from main_site.models import Resume
-from unittest.mock import patch
+from main_site.models import Blog, BlogImage, Resume, CompanyTrack, CompanyTrackOpen, CompanyTrackStats, Website, License, Api, VisitRollup, PendingVisit, OutboxEmail, UniqueVisitorSketch
+from main_site.visits import VisitBuffer
+from unittest.mock import Mock, patch
 
 
 class MainResumeViewTest(TestCase):
@@ -22,3 +64,1054 @@ class MainResumeViewTest(TestCase):
             response = main_resume(request)
             self.assertEqual(response.status_code, 200)
             self.assertEqual(response.content, b'No resume found')
+
+
+class PeriodicTaskTest(SimpleTestCase):
+    def test_stale_connections_are_closed_around_every_call(self):
+        connection_state = {'dropped': True}
+
+        def reconnect():
+            connection_state['dropped'] = False
+
+        def flush():
+            if connection_state['dropped']:
+                raise InterfaceError('connection already closed')
+            runs.append(1)
+            # the server drops the idle connection between runs
+            connection_state['dropped'] = True
+
+        runs = []
+        task = PeriodicTask(0.01, flush)
+        with patch('main_site.background.close_old_connections', side_effect=reconnect):
+            task.start()
+            deadline = time.monotonic() + 5
+            while len(runs) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            task.stop()
+        self.assertGreaterEqual(len(runs), 2)
+
+
+class GeoLocationCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = GeoLocationCache(max_size=2, ttl=100, negative_ttl=10, clock=lambda: self.now)
+
+    def test_lookup_is_fetched_once(self):
+        fetch = Mock(return_value={'country': 'India', 'query': '1.1.1.1'})
+        self.cache.get_or_fetch('1.1.1.1', fetch)
+        data = self.cache.get_or_fetch('1.1.1.1', fetch)
+        self.assertEqual(data['country'], 'India')
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('a', {'query': 'a'})
+        self.cache.set('b', {'query': 'b'})
+        self.cache.get('a')
+        self.cache.set('c', {'query': 'c'})
+        self.assertEqual(self.cache.get('b'), (False, None))
+        self.assertTrue(self.cache.get('a')[0])
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_entries_expire(self):
+        self.cache.set('a', {'query': 'a'})
+        self.now = 101
+        self.assertEqual(self.cache.get('a'), (False, None))
+
+    def test_failed_lookups_are_cached_briefly(self):
+        fetch = Mock(return_value=None)
+        self.assertIsNone(self.cache.get_or_fetch('a', fetch))
+        self.assertIsNone(self.cache.get_or_fetch('a', fetch))
+        self.assertEqual(fetch.call_count, 1)
+        self.now = 11
+        self.cache.get_or_fetch('a', fetch)
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(self.cache.stats()['negative_hits'], 1)
+
+
+class GeoIPDatabaseTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        csv_path = os.path.join(self.directory.name, 'ranges.csv')
+        with open(csv_path, 'w') as csv_file:
+            csv_file.write(
+                'network,start_ip,end_ip,country,city,zip\n'
+                ',10.0.0.0,10.0.0.255,India,Hyderabad,500001\n'
+                '8.8.8.0/24,,,United States,Mountain View,94043\n'
+                '2001:db8::/32,,,Germany,Berlin,10115\n'
+            )
+        self.index_path = os.path.join(self.directory.name, 'geoip.idx')
+        self.assertEqual(build_index(csv_path, self.index_path), 3)
+        self.database = GeoIPDatabase(self.index_path)
+
+    def tearDown(self):
+        self.database.close()
+        self.directory.cleanup()
+
+    def test_lookup_returns_ip_api_keys(self):
+        data = self.database.lookup('8.8.8.8')
+        self.assertEqual(data['country'], 'United States')
+        self.assertEqual(data['city'], 'Mountain View')
+        self.assertEqual(data['zip'], '94043')
+        self.assertEqual(data['query'], '8.8.8.8')
+
+    def test_range_boundaries(self):
+        self.assertEqual(self.database.lookup('10.0.0.0')['city'], 'Hyderabad')
+        self.assertEqual(self.database.lookup('10.0.0.255')['city'], 'Hyderabad')
+        self.assertIsNone(self.database.lookup('10.0.1.0'))
+        self.assertIsNone(self.database.lookup('1.1.1.1'))
+
+    def test_ipv6_and_invalid_addresses(self):
+        self.assertEqual(self.database.lookup('2001:db8::1')['country'], 'Germany')
+        self.assertIsNone(self.database.lookup('not-an-ip'))
+
+    @patch('main_site.geoip._database', None)
+    @patch('main_site.utils.get_geo_cache', return_value=GeoLocationCache())
+    @patch('main_site.utils.fetch_ip_address_data_batch', return_value={'2.2.2.2': {'country': 'Germany'}})
+    @patch('main_site.utils.fetch_ip_address_data', return_value={'country': 'India'})
+    def test_missing_index_falls_back_to_ip_api_once(self, fetch, fetch_batch, _):
+        missing_path = os.path.join(self.directory.name, 'missing.idx')
+        with override_settings(GEOLOCATION_BACKEND='offline', GEOIP_INDEX_PATH=missing_path):
+            with self.assertLogs('main_site.geoip', level='WARNING') as logs:
+                self.assertEqual(get_ip_address_data('1.1.1.1')['country'], 'India')
+                self.assertEqual(get_ip_address_data_many(['2.2.2.2'])['2.2.2.2']['country'], 'Germany')
+                self.assertIsNone(get_geoip_database())
+        self.assertEqual(len(logs.records), 1)
+        fetch.assert_called_once_with('1.1.1.1')
+        fetch_batch.assert_called_once_with(['2.2.2.2'])
+
+
+class VisitBufferTest(TestCase):
+    def setUp(self):
+        self.website = Website.objects.create(name='Portfolio', url='https://saipraveen.me')
+        self.location = {'country': 'India', 'city': 'Hyderabad', 'zip': '500001', 'ip_address': '1.1.1.1'}
+
+    def test_write_through(self):
+        VisitBuffer().add(self.website.pk, **self.location)
+        VisitBuffer().add(self.website.pk, **self.location)
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 2)
+        location = self.website.locations.get()
+        self.assertEqual(location.total_visits, 2)
+
+    def test_buffered_visits_are_written_on_flush(self):
+        buffer = VisitBuffer(flush_interval=3600)
+        self.addCleanup(buffer.stop)
+        for _ in range(3):
+            buffer.add(self.website.pk, **self.location)
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 0)
+
+        buffer.flush()
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 3)
+        self.assertEqual(self.website.locations.get().total_visits, 3)
+
+    def test_cache_backend(self):
+        buffer = VisitBuffer(flush_interval=3600, backend='cache', key_prefix='test-visits')
+        self.addCleanup(buffer.stop)
+        buffer.add(self.website.pk, count=2, **self.location)
+        buffer.flush()
+        buffer.flush()
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 2)
+
+    def test_interleaved_cache_flushes_count_once(self):
+        first = VisitBuffer(flush_interval=3600, backend='cache', key_prefix='test-interleaved')
+        second = VisitBuffer(flush_interval=3600, backend='cache', key_prefix='test-interleaved')
+        for buffer in (first, second):
+            self.addCleanup(buffer.stop)
+            buffer.add(self.website.pk, **self.location)
+        apply = first._apply
+
+        def apply_while_second_flushes(counts, sketches):
+            second.flush()
+            apply(counts, sketches)
+
+        with patch.object(first, '_apply', apply_while_second_flushes):
+            first.flush()
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 2)
+        second.flush()
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 2)
+        self.assertEqual(self.website.locations.get().total_visits, 2)
+
+
+class CheckLicenseTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.view = check_license('web')(lambda request: HttpResponse('ok'))
+        self.api = Api.objects.create(name='web')
+        self.license = License.objects.create(name='Portfolio')
+        self.license.apis.add(self.api)
+
+    def request(self, license_key):
+        return self.view(self.factory.get('/web/', {'id': license_key}))
+
+    def test_entitlement_is_cached(self):
+        self.assertEqual(self.request(self.license.license_key).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.request(self.license.license_key).status_code, 200)
+
+    def test_unknown_keys_are_cached(self):
+        unknown = uuid.uuid4()
+        self.assertEqual(self.request(unknown).status_code, 403)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.request(unknown).status_code, 403)
+            self.assertEqual(self.request('not-a-key').status_code, 403)
+
+    def test_revoking_takes_effect_once_committed(self):
+        self.request(self.license.license_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.license.active = False
+            self.license.save()
+            # a request racing the transaction re-caches the old row
+            self.assertEqual(self.request(self.license.license_key).status_code, 200)
+        self.assertEqual(self.request(self.license.license_key).status_code, 403)
+
+    def test_removing_api_takes_effect_once_committed(self):
+        self.request(self.license.license_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.license_set.remove(self.license)
+        self.assertEqual(self.request(self.license.license_key).status_code, 403)
+
+
+class VisitRollupTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.license = License.objects.create(name='Portfolio')
+        self.license.apis.add(Api.objects.create(name='analytics'))
+        self.website = Website.objects.create(name='Portfolio', url='https://saipraveen.me', license_key=self.license)
+        self.day = datetime.datetime(2024, 1, 10, tzinfo=datetime.timezone.utc)
+
+    def visit(self, hours, count=1):
+        VisitBuffer().add(self.website.pk, 'India', 'Hyderabad', count=count,
+                          visited_at=self.day + datetime.timedelta(hours=hours, minutes=5))
+
+    def test_visits_are_upserted_into_hourly_buckets(self):
+        self.visit(1)
+        self.visit(1)
+        self.visit(2)
+        rollups = VisitRollup.objects.filter(website=self.website).order_by('bucket')
+        self.assertEqual([rollup.visits for rollup in rollups], [2, 1])
+        self.assertEqual(rollups[0].bucket, self.day + datetime.timedelta(hours=1))
+
+    def test_compaction_folds_hours_into_days(self):
+        self.visit(1)
+        self.visit(5, count=2)
+        self.visit(30)
+        removed = compact_hourly_rollups(self.day + datetime.timedelta(days=1, hours=12))
+        self.assertEqual(removed, 2)
+        daily = VisitRollup.objects.get(granularity=VisitRollup.DAY)
+        self.assertEqual((daily.bucket, daily.visits), (self.day, 3))
+        self.assertEqual(VisitRollup.objects.filter(granularity=VisitRollup.HOUR).count(), 1)
+
+    def test_endpoint_reports_daily_visits(self):
+        self.visit(1)
+        self.visit(30)
+        compact_hourly_rollups(self.day + datetime.timedelta(days=1))
+        query = {'id': self.license.license_key, 'start': '2024-01-10', 'end': '2024-01-11', 'group_by': 'country'}
+        # the license key is public, it does not grant reads on its own
+        self.assertEqual(self.client.get('/api/visits/', query).status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get('/api/visits/', query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['country'], row['visits']) for row in response.data['visits']],
+                         [('India', 1), ('India', 1)])
+
+
+class HyperLogLogTest(SimpleTestCase):
+    def test_estimate_is_close(self):
+        sketch = HyperLogLog()
+        for i in range(20000):
+            sketch.add(f'10.0.{i // 256}.{i % 256}')
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.05)
+
+    def test_small_counts_and_duplicates(self):
+        sketch = HyperLogLog()
+        for _ in range(3):
+            for i in range(10):
+                sketch.add(str(i))
+        self.assertEqual(sketch.count(), 10)
+
+    def test_merge_and_serialization(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(1000):
+            first.add(str(i))
+            second.add(str(i + 500))
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        self.assertAlmostEqual(merged.count(), 1500, delta=1500 * 0.05)
+        self.assertEqual(len(first.to_bytes()), 4097)
+
+
+class UniqueVisitorsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.license = License.objects.create(name='Portfolio')
+        self.license.apis.add(Api.objects.create(name='analytics'))
+        self.website = Website.objects.create(name='Portfolio', url='https://saipraveen.me', license_key=self.license)
+
+    def test_uniques_are_merged_across_days(self):
+        buffer = VisitBuffer(flush_interval=3600)
+        self.addCleanup(buffer.stop)
+        for day in (10, 11):
+            for ip in ('1.1.1.1', '2.2.2.2', f'3.3.3.{day}'):
+                buffer.add(self.website.pk, ip_address=ip,
+                           visited_at=datetime.datetime(2024, 1, day, 12, tzinfo=datetime.timezone.utc))
+        buffer.flush()
+        VisitBuffer().add(self.website.pk, ip_address='1.1.1.1',
+                          visited_at=datetime.datetime(2024, 1, 11, 13, tzinfo=datetime.timezone.utc))
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get('/api/visits/uniques/', {
+            'id': self.license.license_key, 'start': '2024-01-10', 'end': '2024-01-11',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['uniques'], 4)
+        self.assertEqual([day['uniques'] for day in response.data['days']], [3, 3])
+
+    def test_write_through_batches_sketch_merges(self):
+        buffer = VisitBuffer(sketch_interval=3600)
+        self.addCleanup(buffer.stop)
+        for ip in ('1.1.1.1', '2.2.2.2'):
+            buffer.add(self.website.pk, ip_address=ip)
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 2)
+        self.assertFalse(UniqueVisitorSketch.objects.exists())
+
+        buffer.flush()
+        stored = UniqueVisitorSketch.objects.get(website=self.website)
+        self.assertEqual(HyperLogLog.from_bytes(stored.sketch).count(), 2)
+
+
+class BeaconFilterTest(SimpleTestCase):
+    def test_repeats_are_seen_within_window(self):
+        now = [0]
+        beacon_filter = RotatingBloomFilter(window=60, capacity=1000, clock=lambda: now[0])
+        self.assertFalse(beacon_filter.seen('a'))
+        self.assertTrue(beacon_filter.seen('a'))
+        self.assertFalse(beacon_filter.seen('b'))
+        now[0] = 61
+        self.assertTrue(beacon_filter.seen('a'))
+        now[0] = 122
+        self.assertFalse(beacon_filter.seen('a'))
+
+    def test_bot_user_agents(self):
+        self.assertTrue(is_bot('Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'))
+        self.assertTrue(is_bot('curl/8.4.0'))
+        self.assertTrue(is_bot(''))
+        self.assertFalse(is_bot('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                                'Chrome/120.0.0.0 Safari/537.36'))
+
+
+@patch('main_site.views.get_ip_address_data', Mock(return_value={'country': 'India', 'city': 'Hyderabad',
+                                                                  'zip': '500001', 'query': '1.1.1.1'}))
+class WebViewTest(TestCase):
+    browser = 'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0'
+
+    def setUp(self):
+        cache.clear()
+        self.license = License.objects.create(name='Portfolio')
+        self.license.apis.add(Api.objects.create(name='web'))
+        self.website = Website.objects.create(name='Portfolio', url='https://saipraveen.me', license_key=self.license)
+        for patcher in (patch('main_site.beacons.get_beacon_filter', return_value=RotatingBloomFilter(60, capacity=100)),
+                        patch('main_site.visits._visit_buffer', VisitBuffer())):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def beacon(self, user_agent):
+        return self.client.get('/main_site/web/', {'id': self.license.license_key}, HTTP_USER_AGENT=user_agent)
+
+    def test_duplicates_and_bots_are_counted_separately(self):
+        for user_agent in (self.browser, self.browser, 'Googlebot/2.1'):
+            self.assertEqual(self.beacon(user_agent).status_code, 200)
+        self.website.refresh_from_db()
+        self.assertEqual(
+            (self.website.total_visits, self.website.duplicate_visits, self.website.bot_visits), (1, 1, 1))
+        self.assertEqual(self.website.locations.get().city, 'Hyderabad')
+
+    def test_batch_uses_the_request_ip_and_user_agent(self):
+        events = [
+            {'ip_address': '10.0.0.1', 'user_agent': self.browser},
+            {'ip_address': '10.0.0.2', 'user_agent': self.browser, 'timestamp': 'soon'},
+            {'ip_address': '10.0.0.3', 'user_agent': self.browser},
+            {'timestamp': (time.time() - 60) * 1000},
+            {},
+        ]
+        response = self.client.post(f'/main_site/web/batch/?id={self.license.license_key}', json.dumps(events),
+                                    content_type='text/plain', REMOTE_ADDR='10.0.0.9', HTTP_USER_AGENT=self.browser)
+        self.assertEqual(response.json(), {'msg': 'success', 'recorded': 5, 'suppressed': 0})
+        self.website.refresh_from_db()
+        self.assertEqual((self.website.total_visits, self.website.duplicate_visits), (5, 0))
+        self.assertEqual(self.website.locations.get().ip_address, '1.1.1.1')
+
+        # the same batch again within the dedup window
+        response = self.client.post(f'/main_site/web/batch/?id={self.license.license_key}', json.dumps(events),
+                                    content_type='text/plain', REMOTE_ADDR='10.0.0.9', HTTP_USER_AGENT=self.browser)
+        self.assertEqual(response.json(), {'msg': 'success', 'recorded': 0, 'suppressed': 5})
+
+        response = self.client.post(f'/main_site/web/batch/?id={self.license.license_key}', json.dumps(events),
+                                    content_type='text/plain', HTTP_USER_AGENT='curl/8.4.0')
+        self.assertEqual(response.json(), {'msg': 'success', 'recorded': 0, 'suppressed': 5})
+        self.website.refresh_from_db()
+        self.assertEqual((self.website.total_visits, self.website.duplicate_visits, self.website.bot_visits),
+                         (5, 5, 5))
+
+    def test_batch_rejects_invalid_payload(self):
+        response = self.client.post(f'/main_site/web/batch/?id={self.license.license_key}', '{"events": 1}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(GEOLOCATION_DEFERRED=True, GEOLOCATION_WORKER_INTERVAL=0)
+class DeferredGeolocationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_geo_cache().clear()
+        self.license = License.objects.create(name='Portfolio')
+        self.license.apis.add(Api.objects.create(name='web'))
+        self.website = Website.objects.create(name='Portfolio', url='https://saipraveen.me', license_key=self.license)
+        patcher = patch('main_site.visits._visit_buffer', VisitBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('main_site.beacons.get_beacon_filter', Mock(return_value=None))
+    @patch('main_site.utils.fetch_ip_address_data_batch')
+    def test_visits_are_counted_once_resolved(self, fetch_batch):
+        for ip_address in ('10.0.0.1', '10.0.0.1', '10.0.0.2'):
+            self.client.get('/main_site/web/', {'id': self.license.license_key}, REMOTE_ADDR=ip_address,
+                            HTTP_USER_AGENT='Mozilla/5.0 Firefox/121.0')
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 0)
+        self.assertEqual(PendingVisit.objects.count(), 3)
+
+        # provider unavailable, the visits stay pending
+        fetch_batch.return_value = {}
+        self.assertEqual(resolve_pending_visits(), 0)
+        self.assertEqual(PendingVisit.objects.count(), 3)
+
+        fetch_batch.return_value = {'10.0.0.1': {'country': 'India', 'city': 'Hyderabad', 'zip': '500001',
+                                                 'query': '10.0.0.1'}, '10.0.0.2': None}
+        atomic = transaction.atomic
+
+        def no_lookups_in_transaction(*args, **kwargs):
+            fetch_batch.side_effect = AssertionError('geolocated inside a transaction')
+            return atomic(*args, **kwargs)
+
+        with patch('main_site.enrichment.transaction.atomic', no_lookups_in_transaction):
+            self.assertEqual(resolve_pending_visits(), 3)
+        fetch_batch.side_effect = None
+        fetch_batch.assert_called_with(['10.0.0.1', '10.0.0.2'])
+        self.assertFalse(PendingVisit.objects.exists())
+        self.website.refresh_from_db()
+        self.assertEqual(self.website.total_visits, 3)
+        self.assertEqual(self.website.locations.get(city='Hyderabad').total_visits, 2)
+
+
+@override_settings(EMAIL_OUTBOX_ENABLED=True, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                   EMAIL_OUTBOX_INTERVAL=0,
+                   EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60, DEFAULT_FROM_EMAIL='site@example.com',
+                   JOB_APPLICATION_RECEIVER='me@example.com', CONTACT_RECEIVER='me@example.com')
+class EmailOutboxTest(TestCase):
+    def test_contact_email_is_queued_and_sent_later(self):
+        response = self.client.post('/api/email/', json.dumps({'name': 'Ada', 'email': 'ada@example.com',
+                                                                'message': 'Hello'}), content_type='application/json')
+        self.assertEqual(response.content, b'success')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.PENDING)
+
+        self.assertEqual(drain_outbox(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Contact Email - Ada')
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.SENT)
+
+    def test_failed_emails_back_off_then_die(self):
+        email = enqueue_email('Subject', 'site@example.com', 'me@example.com', '<p>Hi</p>')
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(drain_outbox(), 0)
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboxEmail.PENDING, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            drain_outbox()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboxEmail.DEAD, 2))
+            self.assertIn('down', email.last_error)
+
+    def test_emails_are_sent_after_the_claim_commits(self):
+        enqueue_email('Subject', 'site@example.com', 'me@example.com', '<p>Hi</p>')
+        depth = len(connection.savepoint_ids)
+        during_send = []
+
+        def send_messages(messages):
+            claimed = not OutboxEmail.objects.filter(next_attempt_at__lte=timezone.now()).exists()
+            during_send.append((len(connection.savepoint_ids), claimed))
+            return len(messages)
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(drain_outbox(), 1)
+        self.assertEqual(during_send, [(depth, True)])
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.SENT)
+
+
+@override_settings(EMAIL_OUTBOX_ENABLED=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                   DEFAULT_FROM_EMAIL='site@example.com', JOB_APPLICATION_RECEIVER='me@example.com',
+                   COMPANY_TRACK_DIGEST_INTERVAL=0)
+class CompanyTrackAlertTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = CompanyTrack.objects.create(company_name='Acme', country='IN', city='Hyderabad',
+                                                   position='Engineer', url='https://acme.example.com')
+
+    def open_link(self, times=3):
+        for _ in range(times):
+            self.client.get('/main_site/job/track/', {'id': self.company.tracker_id})
+
+    def test_immediate_policy_emails_every_open(self):
+        self.open_link()
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(COMPANY_TRACK_ALERT_POLICY='debounce')
+    def test_debounce_policy_emails_once_per_window(self):
+        self.open_link()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.company.opens.count(), 3)
+
+    @override_settings(COMPANY_TRACK_ALERT_POLICY='digest')
+    def test_digest_policy_collapses_opens(self):
+        self.open_link()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(send_track_digest(), 3)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Acme', mail.outbox[0].alternatives[0][0])
+        self.assertEqual(send_track_digest(), 0)
+        self.assertFalse(self.company.opens.filter(notified=False).exists())
+
+    @override_settings(COMPANY_TRACK_ALERT_POLICY='digest')
+    def test_digest_is_sent_after_the_claim_commits(self):
+        self.open_link()
+        depth = len(connection.savepoint_ids)
+        during_send = []
+
+        def send_email(handler, subject, receiver, message):
+            during_send.append((len(connection.savepoint_ids), self.company.opens.filter(notified=False).count()))
+            raise Exception('Error sending email')
+
+        with patch('main_site.alerts.EmailHandler.send_email', send_email), self.assertRaises(Exception):
+            send_track_digest()
+        self.assertEqual(during_send, [(depth, 0)])
+        # handed back to the next digest
+        self.assertEqual(self.company.opens.filter(notified=False).count(), 3)
+
+    def test_open_aggregates(self):
+        other = CompanyTrack.objects.create(company_name='Acme', country='IN', city='Pune', position='Designer',
+                                            url='https://acme.example.com')
+        self.open_link(times=2)
+        self.client.get('/main_site/job/track/', {'id': other.tracker_id})
+        stats = self.company.open_stats
+        self.assertEqual(stats.open_count, 2)
+        self.assertLessEqual(stats.first_opened, stats.last_opened)
+        self.assertIsNotNone(stats.time_to_first_open)
+
+        [company] = company_open_stats()
+        self.assertEqual((company['company_name'], company['applications'], company['opened_applications'],
+                          company['open_count']), ('Acme', 2, 2, 3))
+
+    def test_buffered_opens_are_written_in_bulk(self):
+        buffer = OpenEventBuffer(flush_interval=3600)
+        self.addCleanup(buffer.stop)
+        for _ in range(3):
+            buffer.add(CompanyTrackOpen(company=self.company))
+        self.assertFalse(self.company.opens.exists())
+        with CaptureQueriesContext(connection) as queries:
+            buffer.flush()
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "main_site_companytrackopen"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.company.opens.count(), 3)
+        self.assertEqual(CompanyTrackStats.objects.get().open_count, 3)
+
+
+@override_settings(EMAIL_OUTBOX_ENABLED=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                   DEFAULT_FROM_EMAIL='site@example.com', JOB_APPLICATION_RECEIVER='me@example.com')
+class JobApplicationViewTest(TestCase):
+    def setUp(self):
+        self.company = CompanyTrack.objects.create(company_name='Acme', country='IN', city='Hyderabad',
+                                                   position='Engineer', url='https://acme.example.com',
+                                                   resume='resumes/acme.pdf')
+
+    def test_matches_django_serializer_without_private_fields(self):
+        response = self.client.get('/main_site/job/track/', {'id': self.company.tracker_id})
+        [expected] = json.loads(serializers.serialize('json', [CompanyTrack.objects.get(pk=self.company.pk)]))
+        for field in ('resume', 'opened', 'opened_date'):
+            del expected['fields'][field]
+        self.assertEqual(response.json(), [expected])
+
+    def test_if_none_match_returns_not_modified(self):
+        response = self.client.get('/main_site/job/track/', {'id': self.company.tracker_id})
+        etag = response['ETag']
+        response = self.client.get('/main_site/job/track/', {'id': self.company.tracker_id},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.company.opens.count(), 2)
+
+
+class CompanyTrackImportTest(TestCase):
+    def run_import(self, text, format='csv', **kwargs):
+        output = io.StringIO()
+        result = import_company_tracks(read_rows(io.BytesIO(text.encode()), format), output, **kwargs)
+        return result, list(csv.DictReader(io.StringIO(output.getvalue())))
+
+    def test_imports_valid_rows_in_batches(self):
+        text = (
+            'company_name,position,country,city,url,note\n'
+            'Acme,Engineer,IN,Hyderabad,https://acme.example.com,\n'
+            'Globex,Developer,Germany,Berlin,https://globex.example.com,referral\n'
+            'Initech,Developer,XX,Austin,https://initech.example.com,\n'
+            'Umbrella,Analyst,US,Raccoon City,https://umbrella.example.com,\n'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            (created, skipped), rows = self.run_import(text, batch_size=2)
+        self.assertEqual((created, skipped), (3, 1))
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 2)
+        self.assertEqual(CompanyTrack.objects.get(company_name='Globex').country.code, 'DE')
+        [error] = [row for row in rows if row['error']]
+        self.assertEqual((error['line'], error['company_name']), ('4', 'Initech'))
+        self.assertIn('country', error['error'])
+        acme = CompanyTrack.objects.get(company_name='Acme')
+        self.assertEqual(rows[0]['tracker_url'], f'https://saipraveen.me/?id={acme.tracker_id}')
+
+    def test_resume_references_must_exist(self):
+        storage = Mock()
+        storage.exists.side_effect = lambda name: name == 'resumes/cv.pdf'
+        text = (
+            '{"company_name": "Acme", "position": "Engineer", "country": "IN", "city": "Pune", "url": "https://a.io"}\n'
+            '{"company_name": "Globex", "position": "Engineer", "country": "IN", "city": "Pune", "url": "https://g.io",'
+            ' "resume": "resumes/missing.pdf"}\n'
+            'not json\n'
+        )
+        (created, skipped), rows = self.run_import(text, 'jsonl', resume='resumes/cv.pdf', storage=storage)
+        self.assertEqual((created, skipped), (1, 2))
+        self.assertEqual(CompanyTrack.objects.get().resume.name, 'resumes/cv.pdf')
+        self.assertEqual(storage.exists.call_count, 2)
+
+    def test_shared_resume_is_kept_on_delete(self):
+        first, second = [
+            CompanyTrack.objects.create(company_name=name, country='IN', city='Pune', position='Engineer',
+                                        url='https://example.com', resume='resumes/cv.pdf')
+            for name in ('Acme', 'Globex')
+        ]
+        with patch('django.db.models.fields.files.FieldFile.delete') as delete:
+            first.delete()
+            delete.assert_not_called()
+            second.delete()
+            delete.assert_called_once()
+
+    def test_shared_resume_is_deleted_with_all_its_trackers_in_bulk(self):
+        trackers = [
+            CompanyTrack.objects.create(company_name=name, country='IN', city='Pune', position='Engineer',
+                                        url='https://example.com', resume=resume)
+            for name, resume in (('Acme', 'resumes/cv.pdf'), ('Globex', 'resumes/cv.pdf'), ('Initech', 'resumes/kept.pdf'),
+                                 ('Umbrella', 'resumes/kept.pdf'))
+        ]
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with patch('django.db.models.fields.files.FieldFile.delete', autospec=True) as delete, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/main_site/companytrack/', {
+                'action': 'delete_selected', 'post': 'yes',
+                '_selected_action': [tracker.pk for tracker in trackers[:3]],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([call.args[0].name for call in delete.call_args_list], ['resumes/cv.pdf'])
+        self.assertEqual(list(CompanyTrack.objects.values_list('company_name', flat=True)), ['Umbrella'])
+
+
+@override_settings(RESUME_DELIVERY='proxy', RESUME_CHUNK_SIZE=4)
+class ResumeDeliveryTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.storage = FileSystemStorage(location=self.directory.name)
+        self.storage.save('resumes/cv.pdf', ContentFile(b'0123456789'))
+        field_file = Mock(storage=self.storage)
+        field_file.name = 'resumes/cv.pdf'
+        self.file = field_file
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        response = deliver_file(self.factory.get('/resume/', headers=headers), self.file, filename='cv.pdf')
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_download(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, b'0123456789'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range_requests(self):
+        response, body = self.get(Range='bytes=2-5')
+        self.assertEqual((response.status_code, body), (206, b'2345'))
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(self.get(Range='bytes=-3')[1], b'789')
+        self.assertEqual(self.get(Range='bytes=20-')[0].status_code, 416)
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(Range='bytes=2-5', If_Range='"stale"')[0].status_code, 200)
+        self.assertEqual(self.get(Range='bytes=2-5', If_Range=etag)[0].status_code, 206)
+
+    def test_conditional_requests(self):
+        response, _ = self.get()
+        self.assertEqual(self.get(If_None_Match=response['ETag'])[0].status_code, 304)
+        self.assertEqual(self.get(If_Modified_Since=response['Last-Modified'])[0].status_code, 304)
+
+    def test_cached_copy_is_sent_as_file(self):
+        file_cache = DiskFileCache(os.path.join(self.directory.name, 'cache'), max_bytes=100)
+        with patch('main_site.file_delivery.get_file_cache', return_value=file_cache):
+            self.get()
+            os.remove(self.storage.path('resumes/cv.pdf'))
+            response, body = self.get()
+            self.assertIsInstance(response, FileResponse)
+            self.assertEqual((body, response['Content-Length']), (b'0123456789', '10'))
+            self.assertEqual(self.get(Range='bytes=8-')[1], b'89')
+
+    @override_settings(RESUME_DELIVERY='redirect')
+    def test_redirects_to_presigned_url(self):
+        self.storage.querystring_auth = True
+        self.storage.url = Mock(return_value='https://bucket.example.com/resumes/cv.pdf?signature=x')
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://bucket.example.com/resumes/cv.pdf?signature=x')
+        self.assertEqual(self.storage.url.call_args.kwargs['expire'], 300)
+
+
+class DiskFileCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = DiskFileCache(directory.name, max_bytes=25)
+
+    def source(self, content):
+        source = Mock(size=len(content), last_modified=timezone.now())
+        source.chunks.return_value = [content]
+        return Mock(return_value=source)
+
+    def read(self, cached):
+        try:
+            return b''.join(cached.chunks(0, cached.size - 1, 4))
+        finally:
+            cached.close()
+
+    def test_second_open_is_served_from_disk(self):
+        open_source = self.source(b'0123456789')
+        self.assertEqual(self.read(self.cache.open('a.pdf', open_source)), b'0123456789')
+        cached = self.cache.open('a.pdf', open_source)
+        self.assertEqual(self.read(cached), b'0123456789')
+        self.assertEqual(open_source.call_count, 1)
+        self.assertEqual(cached.etag, '"%s"' % hashlib.sha256(b'0123456789').hexdigest())
+
+    def test_least_recently_used_content_is_evicted(self):
+        self.cache.open('a.pdf', self.source(b'a' * 10)).close()
+        self.cache.open('b.pdf', self.source(b'b' * 10)).close()
+        os.utime(self.cache.open('a.pdf', Mock()).path, (1, 1))
+        self.cache.open('b.pdf', Mock()).close()
+        self.cache.open('c.pdf', self.source(b'c' * 10)).close()
+        self.assertLessEqual(self.cache.size(), 25)
+        self.cache.open('b.pdf', Mock()).close()
+        open_source = self.source(b'a' * 10)
+        self.cache.open('a.pdf', open_source).close()
+        self.assertEqual(open_source.call_count, 1)
+
+    def test_invalidate_and_oversized_files(self):
+        self.cache.open('a.pdf', self.source(b'0123456789')).close()
+        self.cache.invalidate('a.pdf')
+        open_source = self.source(b'9876543210')
+        self.assertEqual(self.read(self.cache.open('a.pdf', open_source)), b'9876543210')
+        self.assertEqual(open_source.call_count, 1)
+        large = self.source(b'x' * 30)
+        self.assertIs(self.cache.open('large.pdf', large), large.return_value)
+
+
+@override_settings(RESUME_DELIVERY='proxy')
+class ActiveResumeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name)
+        field = Resume._meta.get_field('file')
+        patcher = patch.object(field, 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_resume(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Resume.objects.create(file=self.storage.save(name, ContentFile(content)))
+
+    def test_head_and_conditional_get_skip_database_and_storage(self):
+        self.create_resume('resumes/cv.pdf', b'resume')
+        response = self.client.get('/api/resume/')
+        self.assertEqual(b''.join(response.streaming_content), b'resume')
+        etag = response['ETag']
+        self.assertEqual(etag, '"%s"' % hashlib.sha256(b'resume').hexdigest())
+
+        with self.assertNumQueries(0), patch.object(self.storage, 'open') as storage_open:
+            head = self.client.head('/api/resume/')
+            not_modified = self.client.get('/api/resume/', HTTP_IF_NONE_MATCH=etag)
+        storage_open.assert_not_called()
+        self.assertEqual((head.status_code, head['Content-Length'], head['ETag']), (200, '6', etag))
+        self.assertEqual(head['Content-Type'], 'application/pdf')
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_signals_refresh_the_first_resume(self):
+        first = self.create_resume('resumes/first.pdf', b'first')
+        self.create_resume('resumes/second.pdf', b'second')
+        self.assertEqual(self.client.head('/api/resume/')['Content-Length'], '5')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.client.head('/api/resume/')['Content-Length'], '6')
+
+
+class BlogListViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        created = timezone.now()
+        for index in range(5):
+            Blog.objects.create(title=f'Post {index}', slug=f'post-{index}', content='<p>Body</p>', approved=True,
+                                created_date=created - datetime.timedelta(days=index // 2))
+        Blog.objects.create(title='Draft', slug='draft', content='', created_date=created)
+        Blog.objects.create(title='Hidden', slug='hidden', content='', approved=True, active=False,
+                            created_date=created)
+
+    def test_pages_through_published_posts(self):
+        slugs, cursor = [], None
+        while True:
+            response = self.client.get('/api/blog/', {'limit': 2, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()['blogs']), 2)
+            self.assertNotIn('content', response.json()['blogs'][0])
+            slugs += [blog['slug'] for blog in response.json()['blogs']]
+            cursor = response.json()['next']
+            if cursor is None:
+                break
+        # ties on created_date are broken by the newest id
+        self.assertEqual(slugs, ['post-1', 'post-0', 'post-3', 'post-2', 'post-4'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/blog/', {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_export_streams_a_json_array(self):
+        response = self.client.get('/api/blog/export/')
+        self.assertTrue(response.streaming)
+        posts = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([post['slug'] for post in posts], ['post-1', 'post-0', 'post-3', 'post-2', 'post-4'])
+        self.assertEqual(posts[0]['content'], '<p>Body</p>')
+        self.assertEqual(list(blog_archive_json(chunk_size=2))[-1], ']')
+
+
+class BlogResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.blog = Blog.objects.create(title='Post', slug='post', content='<p>Body</p>', approved=True)
+
+    def test_detail_is_cached_until_the_post_changes(self):
+        response = self.client.get('/api/blog/post/')
+        self.assertEqual(response.json()['content'], '<p>Body</p>')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/blog/post/')
+            not_modified = self.client.get('/api/blog/post/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blog.content = '<p>Edited</p>'
+            self.blog.save()
+        self.assertEqual(self.client.get('/api/blog/post/').json()['content'], '<p>Edited</p>')
+        self.assertEqual(self.client.get('/api/blog/post/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_missing_slug_is_cached_until_created(self):
+        self.assertEqual(self.client.get('/api/blog/new/').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            Blog.objects.create(title='New', slug='new', content='', approved=True)
+        self.assertEqual(self.client.get('/api/blog/new/').status_code, 200)
+        self.assertEqual(len(self.client.get('/api/blog/').json()['blogs']), 2)
+
+    @override_settings(BLOG_CACHE_TTL=86400, BLOG_CACHE_ERROR_TTL=10)
+    def test_missing_slug_is_cached_briefly(self):
+        with patch('main_site.blog_cache.cache.set', wraps=cache.set) as cache_set:
+            self.assertEqual(self.client.get('/api/blog/unknown/').status_code, 404)
+            self.assertEqual(self.client.get('/api/blog/post/').status_code, 200)
+        self.assertEqual([call.args[2] for call in cache_set.call_args_list], [10, 86400])
+
+    def test_list_limits_share_the_entry_of_the_clamped_limit(self):
+        self.client.get('/api/blog/?limit=100')
+        self.client.get('/api/blog/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/blog/?limit=1000')
+            self.client.get('/api/blog/?limit=99999')
+            self.client.get('/api/blog/?limit=10')
+            self.client.get('/api/blog/?limit=0')
+
+    def test_waits_for_the_worker_holding_the_rebuild_lock(self):
+        build = Mock(return_value=(200, {'title': 'Post'}))
+        request = RequestFactory().get('/api/blog/post/')
+        entry = (200, b'{"title":"Post"}', '"etag"')
+        with patch('main_site.blog_cache.cache') as mock_cache, patch('main_site.blog_cache.time.sleep'):
+            mock_cache.get.side_effect = [0, None, entry]
+            mock_cache.add.return_value = False
+            response = cached_blog_response(request, 'post', 'detail', build)
+        build.assert_not_called()
+        self.assertEqual(response.content, b'{"title":"Post"}')
+
+
+class BlogSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        created = timezone.now()
+        Blog.objects.create(title='Caching in Django', slug='caching', approved=True, created_date=created,
+                            content='<h2>Why</h2><p>Caching responses keeps <b>Django</b> fast &amp; cheap.</p>'
+                                    '<script>var cached = 1;</script>')
+        Blog.objects.create(title='Deploying', slug='deploying', approved=True, created_date=created,
+                            content='<p>Deploying Django apps to a cache friendly CDN.</p>')
+        Blog.objects.create(title='Draft about caching', slug='draft', content='<p>caching</p>')
+
+    def test_plain_text_is_kept_on_save(self):
+        self.assertEqual(Blog.objects.get(slug='caching').plain_text,
+                         'Why\nCaching responses keeps Django fast & cheap.')
+
+    def test_prefix_search_ranks_titles_first(self):
+        response = self.client.get('/api/blog/search/', {'q': 'cach'})
+        results = response.json()['results']
+        self.assertEqual([result['slug'] for result in results], ['caching', 'deploying'])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+        self.assertIn('<mark>Caching</mark> responses', results[0]['snippet'])
+        self.assertIn('&amp;', results[0]['snippet'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual([result['slug'] for result in search_blogs('django cdn')], ['deploying'])
+        self.assertEqual(search_blogs('kubernetes'), [])
+        self.assertEqual(self.client.get('/api/blog/search/').status_code, 400)
+
+    def test_index_follows_changes(self):
+        self.assertEqual(search_blogs('kubernetes'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Blog.objects.create(title='Kubernetes', slug='kubernetes', content='', approved=True)
+        self.assertEqual([result['slug'] for result in search_blogs('kube')], ['kubernetes'])
+
+
+@override_settings(BLOG_EXCERPT_LENGTH=20, BLOG_WORDS_PER_MINUTE=2)
+class BlogDerivedFieldsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.blog = Blog.objects.create(title='Post', slug='post', approved=True, content=(
+            '<h2>Setup</h2><p>Install the package first.</p><img src="https://img.example.com/a.png">'
+            '<h2>Setup</h2><h3 id="usage">Usage &amp; tips</h3><img src="https://img.example.com/a.png">'
+        ))
+
+    def test_derived_fields_are_saved(self):
+        blog = Blog.objects.get(pk=self.blog.pk)
+        self.assertEqual(blog.excerpt, 'Setup Install the…')
+        self.assertEqual((blog.word_count, blog.reading_time), (9, 5))
+        self.assertEqual(blog.toc, [
+            {'level': 2, 'id': 'setup', 'text': 'Setup'},
+            {'level': 2, 'id': 'setup-2', 'text': 'Setup'},
+            {'level': 3, 'id': 'usage', 'text': 'Usage & tips'},
+        ])
+        self.assertIn('<h2 id="setup">Setup</h2>', blog.content)
+        self.assertIn('<h2 id="setup-2">Setup</h2><h3 id="usage">', blog.content)
+
+    def test_empty_heading_ids_are_replaced_once(self):
+        self.blog.content = "<h2 id=''>Intro</h2><h2 id>Intro</h2>"
+        self.blog.save()
+        self.blog.save()
+        blog = Blog.objects.get(pk=self.blog.pk)
+        self.assertEqual(blog.content, '<h2 id="intro">Intro</h2><h2 id="intro-2">Intro</h2>')
+        self.assertEqual([heading['id'] for heading in blog.toc], ['intro', 'intro-2'])
+
+    def test_update_fields_include_derived_fields(self):
+        self.blog.content = '<p>Short</p>'
+        self.blog.save(update_fields=['content'])
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).toc, [])
+
+    def test_endpoints_serve_derived_fields(self):
+        detail = self.client.get('/api/blog/post/').json()
+        self.assertEqual([heading['id'] for heading in detail['toc']], ['setup', 'setup-2', 'usage'])
+        self.assertEqual(detail['reading_time'], 5)
+        [summary] = self.client.get('/api/blog/').json()['blogs']
+        self.assertEqual(summary['excerpt'], 'Setup Install the…')
+
+
+class BlogImageCleanupTest(TestCase):
+    def test_extract_image_urls(self):
+        html = ('<p>a > b</p><IMG alt="x > y" SRC="https://img.example.com/1.png?w=1&amp;h=2"/>'
+                "<img src='https://img.example.com/2.png'><img alt=\"no source\"><img src=\"https://img.example.com/2.png\">")
+        self.assertEqual(extract_image_urls(html), [
+            'https://img.example.com/1.png?w=1&h=2',
+            'https://img.example.com/2.png',
+        ])
+
+    @patch('main_site.images.cloudinary.api')
+    def test_delete_unused_images(self, cloudinary_api):
+        blog = Blog.objects.create(title='Post', slug='post', content='<img src="https://img.example.com/kept.png">')
+        for name in ('kept', 'removed'):
+            BlogImage.objects.create(blog=blog, public_id=f'blog/{blog.pk}/{name}',
+                                     url=f'https://img.example.com/{name}.png')
+        blog.delete_unused_images()
+        cloudinary_api.delete_resources.assert_called_once_with([f'blog/{blog.pk}/removed'], resource_type='image',
+                                                                type='upload')
+        self.assertEqual(list(BlogImage.objects.values_list('public_id', flat=True)), [f'blog/{blog.pk}/kept'])
+
+
+class FakeCloudinaryApi:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def delete_resources(self, public_ids, **options):
+        with self.lock:
+            self.calls.append(('resources', list(public_ids)))
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError('Cloudinary is down')
+
+    def delete_folder(self, folder):
+        with self.lock:
+            self.calls.append(('folder', folder))
+
+
+@override_settings(CLOUDINARY_DELETE_BATCH_SIZE=2, CLOUDINARY_DELETE_WORKERS=3, CLOUDINARY_DELETE_RETRIES=1,
+                   CLOUDINARY_DELETE_RETRY_DELAY=0)
+class CloudinaryBatchDeletionTest(TestCase):
+    def test_batches_are_retried_before_folders_are_deleted(self):
+        api = FakeCloudinaryApi(failures=1)
+        public_ids = [f'blog/1/{number}' for number in range(5)]
+        self.assertEqual(sorted(delete_cloudinary_images(public_ids, ['blog/1'], api=api)), public_ids)
+        batches = [ids for kind, ids in api.calls if kind == 'resources']
+        self.assertTrue(all(len(ids) <= 2 for ids in batches))
+        self.assertEqual(len(batches), 4)
+        self.assertEqual(api.calls[-1], ('folder', 'blog/1'))
+
+    def test_failure_keeps_the_rows_left_behind(self):
+        api = FakeCloudinaryApi(failures=2)
+        with self.assertRaises(ImageDeletionError) as caught:
+            delete_cloudinary_images(['a'], ['blog/1'], api=api)
+        self.assertEqual((caught.exception.deleted, caught.exception.public_ids), ([], ['a']))
+        self.assertNotIn(('folder', 'blog/1'), api.calls)
+
+    def test_delete_images_of_several_blogs(self):
+        blogs = [Blog.objects.create(title=f'Post {number}', slug=f'post-{number}', content='') for number in range(2)]
+        for blog in blogs:
+            for number in range(3):
+                BlogImage.objects.create(blog=blog, public_id=f'blog/{blog.pk}/{number}', url='https://img.example.com')
+        api = FakeCloudinaryApi()
+        with patch('main_site.images.cloudinary.api', api), self.assertNumQueries(2):
+            Blog.delete_images_of(Blog.objects.all())
+        self.assertEqual(len([call for call in api.calls if call[0] == 'resources']), 3)
+        self.assertEqual(sorted(folder for kind, folder in api.calls if kind == 'folder'),
+                         sorted(f'blog/{blog.pk}' for blog in blogs))
+        self.assertFalse(BlogImage.objects.exists())
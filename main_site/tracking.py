@@ -0,0 +1,147 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Sum
+
+from .background import PeriodicTask
+from .models import CompanyTrack, CompanyTrackOpen, CompanyTrackStats
+
+
+def update_open_stats(events):
+    """
+    Fold newly written open events into the per application CompanyTrackStats rows.
+    """
+    by_company = defaultdict(list)
+    for event in events:
+        by_company[event.company_id].append(event.opened_at)
+    applied_dates = dict(CompanyTrack.objects.filter(pk__in=by_company).values_list('pk', 'applied_date'))
+
+    for company_id, opened in by_company.items():
+        first_opened, last_opened = min(opened), max(opened)
+        applied_date = applied_dates.get(company_id)
+        stats, created = CompanyTrackStats.objects.select_for_update().get_or_create(
+            company_id=company_id,
+            defaults={
+                'first_opened': first_opened,
+                'last_opened': last_opened,
+                'open_count': len(opened),
+                'time_to_first_open': first_opened - applied_date if applied_date else None,
+            },
+        )
+        if not created:
+            stats.first_opened = min(stats.first_opened, first_opened)
+            stats.last_opened = max(stats.last_opened, last_opened)
+            stats.open_count += len(opened)
+            stats.time_to_first_open = stats.first_opened - applied_date if applied_date else None
+            stats.save()
+
+
+class OpenEventBuffer:
+    """
+    Collects CompanyTrackOpen events and writes them with ``bulk_create`` every ``flush_interval`` seconds and
+    when the process exits, updating the open aggregates in the same transaction. A ``flush_interval`` of 0
+    writes every event straight through.
+    """
+
+    def __init__(self, flush_interval=0):
+        self._events = []
+        self._lock = threading.Lock()
+        self._task = PeriodicTask(flush_interval, self.flush, name='company-open-buffer') \
+            if flush_interval > 0 else None
+
+    def add(self, event):
+        if self._task is None:
+            self._write([event])
+            return
+        with self._lock:
+            self._events.append(event)
+        self._task.start()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return
+        try:
+            self._write(events)
+        except Exception:
+            with self._lock:
+                self._events[:0] = events
+            raise
+
+    def _write(self, events):
+        with transaction.atomic():
+            CompanyTrackOpen.objects.bulk_create(events)
+            update_open_stats(events)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.stop()
+
+
+_open_buffer = None
+
+
+def get_open_buffer():
+    """
+    Return the process wide open event buffer, creating it from settings on first use.
+    """
+    global _open_buffer
+    if _open_buffer is None:
+        _open_buffer = OpenEventBuffer(settings.COMPANY_TRACK_OPEN_FLUSH_INTERVAL)
+    return _open_buffer
+
+
+def application_open_stats():
+    """
+    Return the open aggregates of every application that was opened, read from CompanyTrackStats.
+    """
+    rows = CompanyTrackStats.objects.select_related('company').order_by('-last_opened')
+    return [
+        {
+            'tracker_id': stats.company_id,
+            'company_name': stats.company.company_name,
+            'position': stats.company.position,
+            'applied_date': stats.company.applied_date,
+            'first_opened': stats.first_opened,
+            'last_opened': stats.last_opened,
+            'open_count': stats.open_count,
+            'time_to_first_open': stats.time_to_first_open.total_seconds() if stats.time_to_first_open else None,
+        }
+        for stats in rows
+    ]
+
+
+def company_open_stats():
+    """
+    Return the open aggregates per company name, combined from the per application aggregates.
+    """
+    applied = dict(
+        CompanyTrack.objects.values('company_name').annotate(total=Count('pk')).values_list('company_name', 'total')
+    )
+    rows = (
+        CompanyTrackStats.objects.values('company__company_name')
+        .annotate(
+            opened_applications=Count('pk'),
+            open_count=Sum('open_count'),
+            first_opened=Min('first_opened'),
+            last_opened=Max('last_opened'),
+            average_time_to_first_open=Avg('time_to_first_open'),
+        )
+        .order_by('company__company_name')
+    )
+    return [
+        {
+            'company_name': row['company__company_name'],
+            'applications': applied.get(row['company__company_name'], 0),
+            'opened_applications': row['opened_applications'],
+            'open_count': row['open_count'],
+            'first_opened': row['first_opened'],
+            'last_opened': row['last_opened'],
+            'average_time_to_first_open': row['average_time_to_first_open'].total_seconds()
+            if row['average_time_to_first_open'] is not None else None,
+        }
+        for row in rows
+    ]
@@ -1,10 +1,22 @@
 from django.urls import path
-from .views import copy_page, web, job_application, main_resume, upload_image
+from .views import (
+    copy_page,
+    web,
+    web_batch,
+    job_application,
+    job_application_stats,
+    main_resume,
+    upload_image,
+    geo_cache_stats,
+)
 
 urlpatterns = [
     path('copy_page/<uuid:pk>/', copy_page, name='copy_page'),
     path('web/', web, name='web'),
+    path('web/batch/', web_batch, name='web_batch'),
+    path('geo/stats/', geo_cache_stats, name='geo_cache_stats'),
 
     path('job/track/', job_application, name='job_application'),
+    path('job/stats/', job_application_stats, name='job_application_stats'),
     path('upload_image/', upload_image, name='upload_image'),
 ]
@@ -5,18 +5,89 @@ import requests
 from django.conf import settings
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
+from .geoip import get_geoip_database
+from .geolocation import get_geo_cache
 from .models import MainSiteContact
+from .outbox import enqueue_email
 
+IP_API_BATCH_SIZE = 100
 
-def get_ip_address_data(ip_add):
+
+def fetch_ip_address_data(ip_add):
+    """
+    Look up an IP address with ip-api.com. Returns None when the lookup fails.
+    """
     url = f'http://ip-api.com/json/{ip_add}'
-    data = requests.get(url).json()
-    if data:
+    try:
+        data = requests.get(url, timeout=settings.GEOLOCATION_TIMEOUT).json()
+    except (requests.RequestException, ValueError):
+        return None
+    if data and data.get('status') != 'fail':
         return data
 
     return None
 
 
+def fetch_ip_address_data_batch(ip_addresses):
+    """
+    Look up several IP addresses with ip-api.com batch requests of up to 100 addresses each.
+    Returns a dict of address to data, None for the lookups that failed. Addresses of batches that could not be
+    sent at all are left out.
+    """
+    results = {}
+    for start in range(0, len(ip_addresses), IP_API_BATCH_SIZE):
+        chunk = ip_addresses[start:start + IP_API_BATCH_SIZE]
+        try:
+            response = requests.post('http://ip-api.com/batch', json=chunk, timeout=settings.GEOLOCATION_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError):
+            continue
+        found = {item.get('query'): item for item in data if item.get('status') != 'fail'}
+        for ip_add in chunk:
+            results[ip_add] = found.get(ip_add)
+    return results
+
+
+def get_ip_address_data(ip_add):
+    """
+    Look up an IP address with the configured geolocation backend.
+
+    The offline backend answers from the local geoip index, ip-api.com lookups go through the geolocation cache.
+    Without a usable index the offline backend falls back to ip-api.com.
+    """
+    database = get_geoip_database() if settings.GEOLOCATION_BACKEND == 'offline' else None
+    if database is not None:
+        return database.lookup(ip_add)
+    return get_geo_cache().get_or_fetch(ip_add, fetch_ip_address_data)
+
+
+def get_ip_address_data_many(ip_addresses):
+    """
+    Look up several IP addresses at once with the configured geolocation backend.
+    Returns a dict of address to data, None for the lookups that failed. Addresses missing from the result could
+    not be looked up because the provider is unavailable.
+    """
+    ip_addresses = list(dict.fromkeys(ip_addresses))
+    database = get_geoip_database() if settings.GEOLOCATION_BACKEND == 'offline' else None
+    if database is not None:
+        return {ip_add: database.lookup(ip_add) for ip_add in ip_addresses}
+
+    geo_cache = get_geo_cache()
+    results = {}
+    missing = []
+    for ip_add in ip_addresses:
+        found, data = geo_cache.get(ip_add)
+        if found:
+            results[ip_add] = data
+        else:
+            missing.append(ip_add)
+    for ip_add, data in fetch_ip_address_data_batch(missing).items():
+        geo_cache.set(ip_add, data)
+        results[ip_add] = data
+    return results
+
+
 class EmailHandler:
     def __init__(self):
         self.sender = settings.DEFAULT_FROM_EMAIL
@@ -24,6 +95,9 @@ class EmailHandler:
         self.contact_receiver = settings.CONTACT_RECEIVER
 
     def send_email(self, subject, receiver, message):
+        if settings.EMAIL_OUTBOX_ENABLED:
+            enqueue_email(subject, self.sender, receiver, message)
+            return
         try:
             send_mail(
                 subject=subject,
@@ -1,18 +1,39 @@
+import datetime
 import json
+from collections import Counter
 
 import cloudinary.uploader
 import django.utils.log
-from django.core import serializers
-from django.http import FileResponse, JsonResponse
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import content_disposition_header, http_date
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from main_site.alerts import record_company_open
+from main_site.analytics import parse_range, visit_series, unique_visitors
+from main_site.beacons import suppression_reason
+from main_site.blog import blog_archive_json, blog_page, decode_cursor
+from main_site.blog_cache import LIST, cached_blog_response
 from main_site.decorator import check_license
-from main_site.models import Website, CompanyTrack, Resume, BlogImage, Blog
+from main_site.enrichment import start_enrichment_worker
+from main_site.file_delivery import deliver_file
+from main_site.geolocation import get_geo_cache
+from main_site.models import Website, CompanyTrack, Resume, BlogImage, Blog, VisitRollup, PendingVisit
+from main_site.resumes import get_active_resume
+from main_site.search import search_blogs
+from main_site.serializers import company_track_json, body_etag
+from main_site.tracking import application_open_stats, company_open_stats
 from main_site.utils import get_ip_address_data
+from main_site.visits import get_visit_buffer
 from .models import MainSiteContact
 from .utils import EmailHandler
 
@@ -33,28 +54,147 @@ def web(request):
     """
     Handle a web request and increment the total visits of the website and location.
 
+    Beacons from bots and repeats of the same license, IP and user agent within BEACON_DEDUP_WINDOW are only
+    counted in the website's bot_visits and duplicate_visits. With GEOLOCATION_DEFERRED the visit is stored as a
+    PendingVisit and geolocated and counted later by the enrichment worker.
+
     :param request: The HTTP request.
     :return: JsonResponse with a success message.
     """
-    website = Website.objects.get(license_key=request.GET.get('id'))
-    website.total_visits += 1
-
-    location_data = get_ip_address_data(request.META.get('REMOTE_ADDR'))
-    location, created = website.locations.get_or_create(
+    license_key = request.GET.get('id')
+    website_id = Website.objects.values_list('pk', flat=True).get(license_key=license_key)
+
+    ip_address = request.META.get('REMOTE_ADDR')
+    reason = suppression_reason(license_key, ip_address, request.META.get('HTTP_USER_AGENT', ''))
+    if reason:
+        get_visit_buffer().suppress(website_id, reason)
+        return JsonResponse({'msg': 'success'})
+
+    if settings.GEOLOCATION_DEFERRED:
+        PendingVisit.objects.create(website_id=website_id, ip_address=ip_address, visited_at=timezone.now())
+        start_enrichment_worker()
+        return JsonResponse({'msg': 'success'})
+
+    location_data = get_ip_address_data(ip_address) or {}
+    get_visit_buffer().add(
+        website_id,
         country=location_data.get('country'),
         city=location_data.get('city'),
         zip=location_data.get('zip'),
-        ip_address=location_data.get('query'),
+        ip_address=location_data.get('query', ip_address) if settings.VISIT_STORE_IP_ADDRESS else '',
+        visitor_id=ip_address,
     )
-    location.total_visits += 1
-    location.save()
-    website.save()
     return JsonResponse({'msg': 'success'})
 
 
+def _event_time(event, now):
+    """
+    Return the time of a batched beacon event, ``timestamp`` in milliseconds since the epoch. Missing, invalid and
+    implausible timestamps fall back to ``now``.
+    """
+    try:
+        visited_at = datetime.datetime.fromtimestamp(float(event['timestamp']) / 1000, datetime.timezone.utc)
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        return now
+    if not now - datetime.timedelta(days=1) <= visited_at <= now:
+        return now
+    return visited_at
+
+
+@csrf_exempt
+@require_POST
+@check_license('web')
+def web_batch(request):
+    """
+    Record a batch of page views in one request, e.g. buffered on the client and sent with navigator.sendBeacon.
+
+    The body is a JSON list of events, or an object with an ``events`` list. Each event may carry a
+    ``timestamp`` (milliseconds since the epoch). Every event is attributed to the IP address and user agent of
+    the request, the license key is public so client supplied ones cannot be trusted. The bot and dedup filters
+    judge the batch as a whole, a repeated batch within BEACON_DEDUP_WINDOW is counted as duplicates. The
+    counters are written in one transaction.
+
+    :param request: The HTTP request.
+    :return: JsonResponse with the number of recorded and suppressed events.
+    """
+    try:
+        events = json.loads(request.body)
+        if isinstance(events, dict):
+            events = events.get('events')
+        if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+    events = events[:settings.BEACON_BATCH_MAX_EVENTS]
+
+    license_key = request.GET.get('id')
+    website_id = Website.objects.values_list('pk', flat=True).get(license_key=license_key)
+    now = timezone.now()
+    ip_address = request.META.get('REMOTE_ADDR')
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+    # the batch is one beacon for the bot and dedup filters, its events are distinct page views
+    suppressed = Counter()
+    accepted = []
+    reason = suppression_reason(license_key, ip_address, user_agent)
+    if reason:
+        suppressed[reason] = len(events)
+    else:
+        accepted = [_event_time(event, now) for event in events]
+
+    if settings.GEOLOCATION_DEFERRED:
+        PendingVisit.objects.bulk_create([
+            PendingVisit(website_id=website_id, ip_address=ip_address, visited_at=visited_at)
+            for visited_at in accepted
+        ])
+        get_visit_buffer().add_many(website_id, [], suppressed)
+        start_enrichment_worker()
+        return JsonResponse({'msg': 'success', 'recorded': len(accepted), 'suppressed': sum(suppressed.values())})
+
+    location_data = (get_ip_address_data(ip_address) or {}) if accepted else {}
+    visits = [{
+        'country': location_data.get('country'),
+        'city': location_data.get('city'),
+        'zip': location_data.get('zip'),
+        'ip_address': location_data.get('query', ip_address) if settings.VISIT_STORE_IP_ADDRESS else '',
+        'visited_at': visited_at,
+        'visitor_id': ip_address,
+    } for visited_at in accepted]
+    get_visit_buffer().add_many(website_id, visits, suppressed)
+    return JsonResponse({'msg': 'success', 'recorded': len(visits), 'suppressed': sum(suppressed.values())})
+
+
+@staff_member_required
+def job_application_stats(request):
+    """
+    Report how often and when job applications were opened, per application and per company.
+
+    :param request: The HTTP request.
+    :return: JsonResponse with the precomputed open aggregates.
+    """
+    return JsonResponse({
+        'applications': application_open_stats(),
+        'companies': company_open_stats(),
+    })
+
+
+@staff_member_required
+def geo_cache_stats(request):
+    """
+    Report the hit/miss counters of this worker's geolocation cache.
+
+    :param request: The HTTP request.
+    :return: JsonResponse with the cache statistics.
+    """
+    return JsonResponse(get_geo_cache().stats())
+
+
 def job_application(request):
     """
-    Handle a job application request and send an email alert.
+    Handle a job application request, record the open and alert about it per COMPANY_TRACK_ALERT_POLICY.
+
+    The response carries an ETag, a matching If-None-Match gets a 304 without a body. The open is recorded either
+    way.
 
     :param request: The HTTP request.
     :return: HttpResponse with the serialized company object.
@@ -62,12 +202,17 @@ def job_application(request):
     id = request.GET.get('id')
     company = CompanyTrack.objects.get(tracker_id=id)
     company.opened = True
-    company.save()
-    EmailHandler().send_company_track_alert(company)
-    #     return entire model as json
-    company_json = serializers.serialize('json', [company, ])
+    company.save(update_fields=['opened', 'opened_date'])
+    record_company_open(company)
+    company_json = company_track_json(company)
+    etag = body_etag(company_json)
 
-    return HttpResponse(company_json, content_type='application/json')
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(company_json, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 def resume(request):
@@ -75,28 +220,44 @@ def resume(request):
     Handle a resume request.
 
     :param request: The HTTP request.
-    :return: FileResponse with the resume file.
+    :return: The resume file of the tracker, delivered per RESUME_DELIVERY.
     """
     tracker_id = request.GET.get('id')
     if tracker_id:
         company = CompanyTrack.objects.get(tracker_id=tracker_id)
-        file = company.resume.storage.open(company.resume.name, 'rb')
-        return FileResponse(file)
+        return deliver_file(request, company.resume)
 
 
 def main_resume(request):
     """
     Handle a main resume request.
 
+    The active resume is described by a cached record, so HEAD and conditional GET requests are answered without
+    the database or storage.
+
     :param request: The HTTP request.
-    :return: FileResponse with the main resume file.
+    :return: The main resume file, delivered per RESUME_DELIVERY.
     """
-    file = Resume.objects.first()
-    if not file:
+    record = get_active_resume()
+    if not record:
         return HttpResponse('No resume found')
-    file = file.file.storage.open(file.file.name, 'rb')
 
-    return FileResponse(file, as_attachment=False, filename="sai_praveen_kondapalli_resume." + file.name.split('.')[-1])
+    filename = "sai_praveen_kondapalli_resume." + record['name'].split('.')[-1]
+    etag = f'"{record["checksum"]}"'
+    last_modified = int(record['last_modified'])
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and request.method == 'HEAD':
+        response = HttpResponse(content_type=record['content_type'])
+        response['Content-Length'] = record['size']
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+    if response is not None:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    file = Resume(pk=record['pk'], file=record['name']).file
+    return deliver_file(request, file, filename=filename, etag=etag)
 
 
 @csrf_exempt
@@ -158,35 +319,155 @@ def upload_image(request):
 
 class BlogListView(APIView):
     """
-    List all blogs.
+    List the approved and active blogs, newest first.
+
+    Query parameters: ``limit`` (default BLOG_PAGE_SIZE) and ``cursor``, the ``next`` value of the previous page.
+    Pages are served from the blog response cache.
+    """
+
+    def get(self, request, format=None):
+        cursor = request.GET.get('cursor') or None
+        try:
+            limit = int(request.GET.get('limit') or 0)
+            if cursor:
+                decode_cursor(cursor)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        # clamped before it goes into the cache key, every out of range limit shares the entry of the page it gets
+        limit = min(limit if limit > 0 else settings.BLOG_PAGE_SIZE, settings.BLOG_MAX_PAGE_SIZE)
+
+        def build():
+            blogs, next_cursor = blog_page(cursor, limit)
+            return status.HTTP_200_OK, {
+                'blogs': [{
+                    'title': blog['title'],
+                    'slug': blog['slug'],
+                    'created_date': blog['created_date'],
+                    'approved': blog['approved'],
+                    'active': blog['active'],
+                    'excerpt': blog['excerpt'],
+                    'reading_time': blog['reading_time'],
+                } for blog in blogs],
+                'next': next_cursor,
+            }
+
+        return cached_blog_response(request, LIST, f'{limit}:{cursor}', build)
+
+
+class BlogSearchView(APIView):
+    """
+    Search the approved and active blogs by title and content.
+
+    Query parameters: ``q``, every word of which must match the start of a word of the post, and ``limit``
+    (default BLOG_PAGE_SIZE).
     """
 
     def get(self, request, format=None):
-        blogs = Blog.objects.all().order_by('-created_date')
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = int(request.GET.get('limit') or 0)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not query:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
         return Response({
-            'blogs': [{
-                'title': blog.title,
-                'content': blog.content,
-                'slug': blog.slug,
-                'created_date': blog.created_date,
-                'approved': blog.approved,
-                'active': blog.active,
-            } for blog in blogs]
+            'results': [{
+                'title': result['title'],
+                'slug': result['slug'],
+                'created_date': result['created_date'],
+                'rank': result['rank'],
+                'snippet': result['snippet'],
+            } for result in search_blogs(query, limit if limit > 0 else None)],
+        })
+
+
+class BlogExportView(APIView):
+    """
+    Export every approved and active blog with its content as one JSON array, streamed row by row.
+    """
+
+    def get(self, request, format=None):
+        response = StreamingHttpResponse(blog_archive_json(), content_type='application/json')
+        response['Content-Disposition'] = content_disposition_header(True, 'blogs.json')
+        return response
+
+
+@method_decorator(staff_member_required, name='get')
+@method_decorator(check_license('analytics'), name='get')
+class WebsiteVisitsView(APIView):
+    """
+    Visits of the website of a license over a date range, served from the visit rollups. Staff only, the license
+    key is public in the site's JavaScript.
+
+    Query parameters: ``start`` and ``end`` (ISO dates, inclusive, default the last 7 days), ``granularity``
+    (``day`` or ``hour``) and ``group_by`` (``country`` or ``city``).
+    """
+
+    def get(self, request, format=None):
+        granularity = request.GET.get('granularity', VisitRollup.DAY)
+        group_by = request.GET.get('group_by') or None
+        if granularity not in (VisitRollup.DAY, VisitRollup.HOUR) or group_by not in (None, 'country', 'city'):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = parse_range(request.GET.get('start'), request.GET.get('end'))
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        website = Website.objects.get(license_key=request.GET.get('id'))
+        return Response({
+            'website': website.name,
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'visits': visit_series(website, start, end, granularity, group_by),
+        })
+
+
+@method_decorator(staff_member_required, name='get')
+@method_decorator(check_license('analytics'), name='get')
+class UniqueVisitorsView(APIView):
+    """
+    Approximate distinct visitors of the website of a license over a date range. Staff only, like the visits.
+
+    Query parameters: ``start`` and ``end`` (ISO dates, inclusive, default the last 7 days).
+    """
+
+    def get(self, request, format=None):
+        try:
+            start, end = parse_range(request.GET.get('start'), request.GET.get('end'))
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        website = Website.objects.get(license_key=request.GET.get('id'))
+        uniques, days = unique_visitors(website, start.date(), end.date())
+        return Response({
+            'website': website.name,
+            'start': start.date(),
+            'end': end.date(),
+            'uniques': uniques,
+            'days': days,
         })
 
 
 class BlogDetailView(APIView):
     """
-    Retrieve a blog instance.
+    Retrieve a blog instance, served from the blog response cache.
     """
 
     def get(self, request, slug, format=None):
-        try:
-            blog = Blog.objects.get(slug=slug)
-            return Response({
+        def build():
+            try:
+                blog = Blog.objects.only('title', 'content', 'created_date', 'toc', 'word_count', 'reading_time') \
+                    .get(slug=slug)
+            except Blog.DoesNotExist:
+                return status.HTTP_404_NOT_FOUND, None
+            return status.HTTP_200_OK, {
                 'title': blog.title,
                 'content': blog.content,
                 'created_at': blog.created_date,
-            })
-        except Blog.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+                'toc': blog.toc,
+                'word_count': blog.word_count,
+                'reading_time': blog.reading_time,
+            }
+
+        return cached_blog_response(request, slug, 'detail', build)
@@ -0,0 +1,266 @@
+import hashlib
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .analytics import add_rollup_visits, hour_bucket, merge_visitor_sketches
+from .background import PeriodicTask
+from .db import upsert_increment
+from .hyperloglog import HyperLogLog
+from .models import Website, Location
+
+# Kinds of buffered counters
+VISIT = 'visit'  # (website_id, country, city, zip, ip_address)
+ROLLUP = 'rollup'  # (website_id, hour bucket, country, city)
+SUPPRESSED = 'suppressed'  # (website_id, counter field)
+
+DUPLICATE_VISITS = 'duplicate_visits'
+BOT_VISITS = 'bot_visits'
+
+LOCATION_CONFLICT_FIELDS = ['website', 'country', 'city', 'zip', 'ip_address']
+
+
+def _increment(model, counts, field='total_visits', **extra):
+    """
+    Add ``counts[pk]`` to ``field`` of each row, one UPDATE per distinct increment.
+    """
+    by_amount = defaultdict(list)
+    for pk, amount in counts.items():
+        by_amount[amount].append(pk)
+    for amount, pks in by_amount.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + amount}, **extra)
+
+
+class VisitBuffer:
+    """
+    Write-behind buffer for Website and Location visit counters and the hourly visit rollups.
+
+    Visits are collected per (website, location) and written as atomic ``F()`` increments and location upserts
+    every ``flush_interval`` seconds and when the process exits. With the ``cache`` backend the counts live in the
+    shared Django cache instead of process memory, and workers take turns flushing them. A ``flush_interval`` of 0
+    writes every visit straight through.
+
+    Distinct visitors are counted in per day HyperLogLog sketches. Those always stay in process memory, merging
+    sketches is idempotent so every worker can merge its own into the stored ones. When visits are written
+    straight through the sketches are still merged every ``sketch_interval`` seconds, merging one per beacon would
+    lock the website's daily sketch row on every visit. A ``sketch_interval`` of 0 merges them straight through too.
+    """
+
+    # Seconds a flush of the cache backend may take before another worker is allowed to start one
+    FLUSH_LOCK_TIMEOUT = 60
+
+    def __init__(self, flush_interval=0, backend='memory', cache_alias='default', key_prefix='visits',
+                 sketch_interval=0):
+        self.flush_interval = flush_interval
+        self.backend = backend
+        self.cache = caches[cache_alias] if backend == 'cache' else None
+        self.key_prefix = key_prefix
+        self._counts = Counter()
+        self._sketches = {}
+        # cache key -> counter key, for the counters this process has touched
+        self._cache_keys = {}
+        self._lock = threading.Lock()
+        self._task = PeriodicTask(flush_interval, self.flush, name='visit-buffer') if flush_interval > 0 else None
+        self._sketch_task = None
+        if self._task is None and sketch_interval > 0:
+            self._sketch_task = PeriodicTask(sketch_interval, self.flush, name='visitor-sketches')
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            flush_interval=settings.VISIT_BUFFER_FLUSH_INTERVAL,
+            backend=settings.VISIT_BUFFER_BACKEND,
+            sketch_interval=settings.VISIT_SKETCH_FLUSH_INTERVAL,
+        )
+
+    def _cache_key(self, key):
+        return f'{self.key_prefix}:{hashlib.md5(repr(key).encode()).hexdigest()}'
+
+    def add(self, website_id, country='', city='', zip='', ip_address='', count=1, visited_at=None,
+            visitor_id=None):
+        """
+        Record ``count`` visits of a website from a location.
+
+        ``visitor_id`` identifies the visitor for the unique visitor count and defaults to ``ip_address``.
+        """
+        self.add_many(website_id, [{
+            'country': country,
+            'city': city,
+            'zip': zip,
+            'ip_address': ip_address,
+            'count': count,
+            'visited_at': visited_at,
+            'visitor_id': visitor_id,
+        }])
+
+    def suppress(self, website_id, field, count=1):
+        """
+        Record beacons that are not counted as visits, ``field`` is DUPLICATE_VISITS or BOT_VISITS.
+        """
+        self.add_many(website_id, [], {field: count})
+
+    def add_many(self, website_id, visits, suppressed=None):
+        """
+        Record several visits of a website at once, each a dict of the keyword arguments of ``add``.
+
+        ``suppressed`` maps DUPLICATE_VISITS/BOT_VISITS to counts. Without buffering everything is written in
+        one transaction.
+        """
+        counts = Counter()
+        visitors = []
+        now = timezone.now()
+        for visit in visits:
+            country, city = visit.get('country') or '', visit.get('city') or ''
+            zip, ip_address = visit.get('zip') or '', visit.get('ip_address') or ''
+            count = visit.get('count', 1)
+            visited_at = visit.get('visited_at') or now
+            counts[(VISIT, website_id, country, city, zip, ip_address)] += count
+            counts[(ROLLUP, website_id, hour_bucket(visited_at), country, city)] += count
+            visitor_id = visit.get('visitor_id') or ip_address
+            if visitor_id:
+                visitors.append(((website_id, visited_at.date()), visitor_id))
+        for field, count in (suppressed or {}).items():
+            counts[(SUPPRESSED, website_id, field)] += count
+
+        if self._task is None and self._sketch_task is None:
+            sketches = {}
+            for key, visitor_id in visitors:
+                sketches.setdefault(key, HyperLogLog()).add(visitor_id)
+            self._apply(counts, sketches)
+            return
+        with self._lock:
+            for key, visitor_id in visitors:
+                self._sketches.setdefault(key, HyperLogLog()).add(visitor_id)
+        if self._task is None:
+            self._apply(counts, {})
+            self._sketch_task.start()
+            return
+        self._buffer(counts)
+
+    def _buffer(self, counts):
+        if self.cache is not None:
+            for key, value in counts.items():
+                cache_key = self._cache_key(key)
+                self.cache.add(cache_key, 0, timeout=None)
+                self.cache.incr(cache_key, value)
+                with self._lock:
+                    self._cache_keys[cache_key] = key
+        else:
+            with self._lock:
+                self._counts.update(counts)
+        self._task.start()
+
+    def flush(self):
+        """
+        Write all buffered counts to the database.
+        """
+        with self._lock:
+            sketches, self._sketches = self._sketches, {}
+        if self.cache is not None:
+            self._flush_cache(sketches)
+            return
+
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts and not sketches:
+            return
+        try:
+            self._apply(counts, sketches)
+        except Exception:
+            with self._lock:
+                self._counts.update(counts)
+                self._restore_sketches(sketches)
+            raise
+
+    def _restore_sketches(self, sketches):
+        for key, sketch in sketches.items():
+            if key in self._sketches:
+                sketch.merge(self._sketches[key])
+            self._sketches[key] = sketch
+
+    def _flush_cache(self, sketches):
+        # Only one worker reads and subtracts the shared counts at a time, two concurrent flushes would both
+        # read the same totals and write them twice.
+        lock_key = f'{self.key_prefix}:flush-lock'
+        if not self.cache.add(lock_key, 1, self.FLUSH_LOCK_TIMEOUT):
+            with self._lock:
+                self._restore_sketches(sketches)
+            return
+        try:
+            self._flush_cache_locked(sketches)
+        finally:
+            self.cache.delete(lock_key)
+
+    def _flush_cache_locked(self, sketches):
+        with self._lock:
+            keys = dict(self._cache_keys)
+        pending = {cache_key: count for cache_key, count in self.cache.get_many(keys).items() if count}
+        with self._lock:
+            for cache_key in set(keys) - set(pending):
+                self._cache_keys.pop(cache_key, None)
+        if not pending and not sketches:
+            return
+
+        try:
+            self._apply({keys[cache_key]: count for cache_key, count in pending.items()}, sketches)
+        except Exception:
+            with self._lock:
+                self._restore_sketches(sketches)
+            raise
+        # subtract what was written rather than deleting, other workers may have counted more meanwhile
+        for cache_key, count in pending.items():
+            self.cache.decr(cache_key, count)
+
+    def _apply(self, counts, sketches):
+        website_counts = Counter()
+        suppressed_counts = defaultdict(Counter)
+        locations = []
+        rollup_counts = {}
+        for key, count in counts.items():
+            if key[0] == SUPPRESSED:
+                _, website_id, field = key
+                suppressed_counts[field][website_id] += count
+            elif key[0] == VISIT:
+                _, website_id, country, city, zip, ip_address = key
+                website_counts[website_id] += count
+                locations.append({
+                    'website': website_id,
+                    'country': country,
+                    'city': city,
+                    'zip': zip,
+                    'ip_address': ip_address,
+                    'total_visits': count,
+                })
+            else:
+                rollup_counts[key[1:]] = count
+
+        with transaction.atomic():
+            _increment(Website, website_counts, last_visit=timezone.now())
+            for field, field_counts in suppressed_counts.items():
+                _increment(Website, field_counts, field)
+            upsert_increment(Location, locations, LOCATION_CONFLICT_FIELDS, 'total_visits')
+            add_rollup_visits(rollup_counts)
+            merge_visitor_sketches(sketches)
+
+    def stop(self):
+        for task in (self._task, self._sketch_task):
+            if task is not None:
+                task.stop()
+
+
+_visit_buffer = None
+
+
+def get_visit_buffer():
+    """
+    Return the process wide visit buffer, creating it from settings on first use.
+    """
+    global _visit_buffer
+    if _visit_buffer is None:
+        _visit_buffer = VisitBuffer.from_settings()
+    return _visit_buffer
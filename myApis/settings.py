@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 import mimetypes
 import os
+import tempfile
 from pathlib import Path
 
 import cloudinary
@@ -105,6 +106,21 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Local memory and dummy caches are private to each worker process, entries another worker invalidates stay stale
+# in them. Caches that must reflect admin changes right away default to a TTL of a few seconds on those.
+CACHE_SHARED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache',
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -162,6 +178,89 @@ EMAIL_HOST_PASSWORD = os.environ.get("MAIL_PASSWORD")
 DEFAULT_FROM_EMAIL = os.environ.get("MAIL_FROM_EMAIL")
 JOB_APPLICATION_RECEIVER = os.environ.get("JOB_APPLICATION_RECEIVER")
 CONTACT_RECEIVER = os.environ.get("CONTACT_RECEIVER")
+# 'immediate' emails every CompanyTrack open, 'debounce' only the first open of a tracker within
+# COMPANY_TRACK_ALERT_WINDOW seconds, 'digest' collects opens into one email every COMPANY_TRACK_DIGEST_INTERVAL.
+# 'debounce' needs a cache shared by all workers (CACHE_SHARED), with LocMemCache each worker alerts once per window.
+COMPANY_TRACK_ALERT_POLICY = os.environ.get("COMPANY_TRACK_ALERT_POLICY", "immediate")
+COMPANY_TRACK_ALERT_WINDOW = int(os.environ.get("COMPANY_TRACK_ALERT_WINDOW", 60 * 30))
+# 0 leaves digests to the send_track_digest command
+COMPANY_TRACK_DIGEST_INTERVAL = float(os.environ.get("COMPANY_TRACK_DIGEST_INTERVAL", 60 * 60))
+# Seconds between bulk writes of buffered CompanyTrack opens, 0 writes every open immediately
+COMPANY_TRACK_OPEN_FLUSH_INTERVAL = float(os.environ.get("COMPANY_TRACK_OPEN_FLUSH_INTERVAL", 0))
+# Link put on resumes for an imported CompanyTrack, {tracker_id} is replaced with its id
+COMPANY_TRACK_URL_TEMPLATE = os.environ.get("COMPANY_TRACK_URL_TEMPLATE", "https://saipraveen.me/?id={tracker_id}")
+COMPANY_TRACK_IMPORT_BATCH_SIZE = int(os.environ.get("COMPANY_TRACK_IMPORT_BATCH_SIZE", 500))
+# Queue emails in the OutboxEmail table and send them in the background instead of during the request. Needs a
+# long running process: the in-process sender below, or `manage.py send_outbox_emails --loop` / a scheduled
+# `manage.py send_outbox_emails`. Leave it off on serverless hosts such as Vercel without such a job.
+EMAIL_OUTBOX_ENABLED = os.environ.get("EMAIL_OUTBOX_ENABLED", "False") == "True"
+# Seconds between runs of the in-process outbox sender, 0 leaves it to the send_outbox_emails command
+EMAIL_OUTBOX_INTERVAL = float(os.environ.get("EMAIL_OUTBOX_INTERVAL", 10))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", 50))
+# Seconds a claimed batch is reserved for its sender, emails of a sender that died are retried afterwards
+EMAIL_OUTBOX_CLAIM_TIMEOUT = int(os.environ.get("EMAIL_OUTBOX_CLAIM_TIMEOUT", 5 * 60))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+# Seconds before the first retry, doubled after every failed attempt
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get("EMAIL_OUTBOX_RETRY_DELAY", 30))
+EMAIL_OUTBOX_MAX_RETRY_DELAY = int(os.environ.get("EMAIL_OUTBOX_MAX_RETRY_DELAY", 60 * 60))
+
+# IP geolocation
+# 'ip-api' queries ip-api.com, 'offline' reads the index built by the build_geoip_index command
+GEOLOCATION_BACKEND = os.environ.get('GEOLOCATION_BACKEND', 'ip-api')
+GEOIP_INDEX_PATH = os.environ.get('GEOIP_INDEX_PATH', str(BASE_DIR / 'geoip.idx'))
+GEOLOCATION_TIMEOUT = float(os.environ.get('GEOLOCATION_TIMEOUT', 2))
+GEOLOCATION_CACHE_SIZE = int(os.environ.get('GEOLOCATION_CACHE_SIZE', 4096))
+GEOLOCATION_CACHE_TTL = int(os.environ.get('GEOLOCATION_CACHE_TTL', 60 * 60 * 24))
+GEOLOCATION_NEGATIVE_CACHE_TTL = int(os.environ.get('GEOLOCATION_NEGATIVE_CACHE_TTL', 60 * 5))
+# Alias of a CACHES entry shared by all workers, e.g. 'default' when it points at a database or redis cache
+GEOLOCATION_SHARED_CACHE = os.environ.get('GEOLOCATION_SHARED_CACHE') or None
+# Store visits as PendingVisit rows and geolocate them in the background instead of during the request
+GEOLOCATION_DEFERRED = os.environ.get('GEOLOCATION_DEFERRED') == 'True'
+# Seconds between runs of the in-process worker resolving pending visits, 0 leaves it to the
+# resolve_pending_visits management command
+GEOLOCATION_WORKER_INTERVAL = float(os.environ.get('GEOLOCATION_WORKER_INTERVAL', 5))
+GEOLOCATION_WORKER_BATCH_SIZE = int(os.environ.get('GEOLOCATION_WORKER_BATCH_SIZE', 1000))
+
+# License checks, cached per key and invalidated when a License or Api changes. Invalidation only reaches other
+# workers through a shared cache, revoking a key takes up to LICENSE_CACHE_TTL seconds otherwise.
+LICENSE_CACHE_TTL = int(os.environ.get('LICENSE_CACHE_TTL', 60 * 10 if CACHE_SHARED else 5))
+LICENSE_NEGATIVE_CACHE_TTL = int(os.environ.get('LICENSE_NEGATIVE_CACHE_TTL', 60 if CACHE_SHARED else 5))
+
+# Visit counters
+# Seconds between writes of buffered visit counts, 0 writes every visit immediately
+VISIT_BUFFER_FLUSH_INTERVAL = float(os.environ.get('VISIT_BUFFER_FLUSH_INTERVAL', 0))
+# 'memory' buffers per worker process, 'cache' buffers in the default cache shared by all workers
+VISIT_BUFFER_BACKEND = os.environ.get('VISIT_BUFFER_BACKEND', 'memory')
+# Seconds between merges of the unique visitor sketches when visits are written immediately, 0 merges per visit.
+# Buffered sketches live in process memory until a background thread writes them, only set this on long running
+# workers such as gunicorn, serverless hosts like Vercel freeze or kill that thread and the sketches are lost.
+VISIT_SKETCH_FLUSH_INTERVAL = float(os.environ.get('VISIT_SKETCH_FLUSH_INTERVAL', 0))
+# Seconds within which repeated beacons of the same license, IP and user agent are not counted, 0 disables
+BEACON_DEDUP_WINDOW = int(os.environ.get('BEACON_DEDUP_WINDOW', 60 * 30))
+# Distinct beacons expected per window, sizes the per worker Bloom filters
+BEACON_DEDUP_CAPACITY = int(os.environ.get('BEACON_DEDUP_CAPACITY', 100000))
+BEACON_FILTER_BOTS = os.environ.get('BEACON_FILTER_BOTS', 'True') == 'True'
+# Events accepted per request by the batched beacon endpoint
+BEACON_BATCH_MAX_EVENTS = int(os.environ.get('BEACON_BATCH_MAX_EVENTS', 500))
+# Keep visitor IP addresses on Location rows, unique visitors are counted from sketches either way
+VISIT_STORE_IP_ADDRESS = os.environ.get('VISIT_STORE_IP_ADDRESS', 'True') == 'True'
+
+# Blog list pagination
+BLOG_PAGE_SIZE = int(os.environ.get('BLOG_PAGE_SIZE', 10))
+BLOG_MAX_PAGE_SIZE = int(os.environ.get('BLOG_MAX_PAGE_SIZE', 100))
+BLOG_EXCERPT_LENGTH = int(os.environ.get('BLOG_EXCERPT_LENGTH', 300))
+BLOG_WORDS_PER_MINUTE = int(os.environ.get('BLOG_WORDS_PER_MINUTE', 200))
+# Rows fetched per round trip by the streamed blog export
+BLOG_EXPORT_CHUNK_SIZE = int(os.environ.get('BLOG_EXPORT_CHUNK_SIZE', 200))
+# Rendered blog responses are cached for BLOG_CACHE_TTL seconds or until the post changes, browsers and CDNs may
+# reuse them for BLOG_CACHE_MAX_AGE seconds before revalidating with the ETag. Changes only invalidate the
+# responses cached by other workers through a shared cache, so the TTL is short on a per process one.
+BLOG_CACHE_TTL = int(os.environ.get('BLOG_CACHE_TTL', 60 * 60 * 24 if CACHE_SHARED else 10))
+BLOG_CACHE_MAX_AGE = int(os.environ.get('BLOG_CACHE_MAX_AGE', 60))
+# 404s and other error responses are cached briefly, requests for made up slugs would otherwise fill the cache
+BLOG_CACHE_ERROR_TTL = int(os.environ.get('BLOG_CACHE_ERROR_TTL', min(BLOG_CACHE_TTL, 10)))
+# Seconds other workers wait for the worker rebuilding an invalidated response
+BLOG_CACHE_LOCK_TIMEOUT = int(os.environ.get('BLOG_CACHE_LOCK_TIMEOUT', 5))
 
 # cloud flare R2
 
@@ -177,6 +276,18 @@ AWS_S3_SIGNATURE_VERSION = 's3v4'
 
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+# Resume downloads: 'redirect' to a presigned storage URL valid for RESUME_URL_EXPIRE seconds, or 'proxy' the file
+# through Django with Range and conditional request support
+RESUME_DELIVERY = os.environ.get('RESUME_DELIVERY', 'redirect')
+RESUME_URL_EXPIRE = int(os.environ.get('RESUME_URL_EXPIRE', 5 * 60))
+RESUME_CHUNK_SIZE = int(os.environ.get('RESUME_CHUNK_SIZE', 64 * 1024))
+RESUME_CACHE_MAX_AGE = int(os.environ.get('RESUME_CACHE_MAX_AGE', 60 * 60))
+# Seconds the active resume record is kept, the signal handlers refresh it only in the worker that saved the resume
+RESUME_RECORD_TTL = int(os.environ.get('RESUME_RECORD_TTL', 60 * 60 * 24 if CACHE_SHARED else 30))
+# Local disk cache of proxied resume files, 0 bytes disables it
+FILE_CACHE_DIR = os.environ.get('FILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'myapis-file-cache'))
+FILE_CACHE_MAX_BYTES = int(os.environ.get('FILE_CACHE_MAX_BYTES', 0))
+
 # Sentry settings only in production
 # settings.py
 if not DEBUG:
@@ -197,6 +308,11 @@ cloudinary.config(
     api_secret=os.environ.get("CLOUDINARY_API_SECRET"),
     secure=True
 )
+# Blog image cleanup, public ids per Admin API call (at most 100), parallel calls and retries per call
+CLOUDINARY_DELETE_BATCH_SIZE = int(os.environ.get("CLOUDINARY_DELETE_BATCH_SIZE", 100))
+CLOUDINARY_DELETE_WORKERS = int(os.environ.get("CLOUDINARY_DELETE_WORKERS", 4))
+CLOUDINARY_DELETE_RETRIES = int(os.environ.get("CLOUDINARY_DELETE_RETRIES", 2))
+CLOUDINARY_DELETE_RETRY_DELAY = float(os.environ.get("CLOUDINARY_DELETE_RETRY_DELAY", 0.5))
 
 # Session
 SESSION_COOKIE_SECURE = True